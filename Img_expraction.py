@@ -1,58 +1,62 @@
-# Fixes the None check in the process_machine_photos function to prevent errors when doc is None or doesn't have paragraphs.
-from PIL import Image
-from docx import Document
+# Fixes the None check in the insert_section_photos function to prevent errors when doc is None or doesn't have paragraphs.
 from docx.shared import Inches
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 import os
 
+from image_sizing import image_nbytes, prepare_photos
+from placeholder_index import find_placeholder, get_placeholder_index
+from utils import open_docx, save_docx
 
-def insert_images_with_placeholder(template_doc, placeholder, image_paths):
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
+
+
+def insert_images_with_placeholder(template_doc, placeholder, image_paths, progress=None):
     """
     Insert images at a specific placeholder in a Word document.
 
     Args:
         template_doc (Document): Document object
         placeholder (str): Placeholder text
-        image_paths (list): List of image paths
+        image_paths (list): Image paths or prepared streams (see prepare_photos)
+        progress (StageProgress): Told the bytes of every inserted image
 
     Returns:
         Document: Updated document
         bool: Whether placeholder was found and replaced
     """
-    placeholder_found = False
-
     # Find the placeholder
-    for i, para in enumerate(template_doc.paragraphs):
-        if placeholder in para.text:
-            # Mark placeholder as found
-            placeholder_found = True
-
-            # Remove the placeholder text
-            para.text = para.text.replace(placeholder, "")
-
-            # Insert images
-            for j, img_path in enumerate(image_paths):
-                try:
-                    if j == 0:
-                        # For first image, add directly to current paragraph
-                        run = para.add_run()
-                        run.add_picture(img_path, width=Inches(6))
-                        para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                    else:
-                        # For additional images, add a new paragraph
-                        new_para = template_doc.add_paragraph()
-                        run = new_para.add_run()
-                        run.add_picture(img_path, width=Inches(6))
-                        new_para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-                        # Add caption
-                        caption_para = template_doc.add_paragraph(f"Image {j+1}")
-                        caption_para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                except Exception as e:
-                    print(f"Error adding image {img_path}: {str(e)}")
-            break
-
-    return template_doc, placeholder_found
+    para = find_placeholder(template_doc, placeholder)
+    if para is None:
+        return template_doc, False
+
+    # Remove the placeholder text
+    para.text = para.text.replace(placeholder, "")
+
+    # Insert images
+    for j, img_path in enumerate(image_paths):
+        try:
+            if j == 0:
+                # For first image, add directly to current paragraph
+                run = para.add_run()
+                run.add_picture(img_path, width=Inches(6))
+                para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+            else:
+                # For additional images, add a new paragraph
+                new_para = template_doc.add_paragraph()
+                run = new_para.add_run()
+                run.add_picture(img_path, width=Inches(6))
+                new_para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+                # Add caption
+                caption_para = template_doc.add_paragraph(f"Image {j+1}")
+                caption_para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+            if progress is not None:
+                progress.update(bytes_written=image_nbytes(img_path))
+        except Exception as e:
+            print(f"Error adding image {j+1} at {placeholder}: {str(e)}")
+
+    return template_doc, True
 
 def get_images_from_folder(folder_path):
     """
@@ -64,114 +68,90 @@ def get_images_from_folder(folder_path):
     Returns:
         list: List of image file paths
     """
-    image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp']
     image_paths = []
 
     if os.path.exists(folder_path):
         for filename in os.listdir(folder_path):
             # Check if the file is an image
-            if any(filename.lower().endswith(ext) for ext in image_extensions):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
                 image_paths.append(os.path.join(folder_path, filename))
 
     return image_paths
 
-def process_machine_photos(docx_path, output_dir=None):
-    """
-    Process machine photos and insert them into the document.
-
-    Args:
-        doc (Document): Document object
-        output_dir (str): Output directory for artifacts
-
-    Returns:
-        Document: Updated document
-        bool: Whether photos were processed
+def prepare_section_photos(job, category, progress=None, target_width=None):
     """
-    doc= Document(docx_path)
-    if doc is None or not hasattr(doc, 'paragraphs'):
-        return None, False
-
-    machine_photos_folder = "uploads/Machine_Photos"
-    image_paths = get_images_from_folder(machine_photos_folder)
-
-    if not image_paths:
-        return doc, False
-
-    # Insert machine photos at Cover Photo placeholder
-    doc, placeholder_found = insert_images_with_placeholder(
-        doc, "{{Insert_Cover_Photo_Here}}", image_paths
-    )
-    print("Inserted machine photos into the document.")
-    doc.save(docx_path)
-    
-    return doc, True
+    Prepare the photos of one upload category for the manual.
 
-def process_layout_photos(docx_path, output_dir=None):
-    """
-    Process layout photos and insert them into the document.
+    Runs as an extraction stage alongside the other sections.
 
     Args:
-        doc (Document): Document object
-        output_dir (str): Output directory for artifacts
+        job (Job): Job whose uploads are read; the prepared photos are kept on job.extracted
+        category (str): Upload category, e.g. "Machine_Photos"
+        progress (StageProgress): Told how many photos there are and when they are ready
+        target_width (int): Pixel width the photos are shown at
 
     Returns:
-        Document: Updated document
-        bool: Whether photos were processed
+        list: Paths or BytesIO streams for add_picture
     """
-    doc= Document(docx_path)
-    layout_photos_folder = "uploads/Layout_Photos"
-    image_paths = get_images_from_folder(layout_photos_folder)
-
-    if not image_paths:
-        return doc, False
+    image_paths = job.input_files(category, IMAGE_EXTENSIONS)
+    if progress is not None:
+        progress.update(total=len(image_paths), unit="photos")
+    prepared = prepare_photos(image_paths, target_width)
+    job.extracted[category] = prepared
+    if progress is not None:
+        progress.update(done=len(prepared))
+    return prepared
 
-    # Insert layout photos at Layout placeholder
-    doc, placeholder_found = insert_images_with_placeholder(
-        doc, "{{Upload_Machine_Layout_here}}", image_paths
-    )
-    print("Inserted layout photos into the document.")
-    doc.save(docx_path)
-    return doc, True
 
-def process_pneumatic_photos(docx_path, output_dir=None):
+def insert_section_photos(docx_path, job, category, placeholder, label, progress=None, target_width=None):
     """
-    Process pneumatic photos and insert them into the document.
+    Insert the photos of one upload category into the document.
+
+    Photos prepared by prepare_section_photos are reused; otherwise they are
+    prepared here.
 
     Args:
-        doc (Document): Document object
-        output_dir (str): Output directory for artifacts
+        docx_path (str | Document): Path to the .docx file or an open Document
+        job (Job): Job whose uploads are read
+        category (str): Upload category, e.g. "Machine_Photos"
+        placeholder (str): Placeholder the photos replace
+        label (str): Section name used in messages
+        progress (StageProgress): Told the bytes inserted
+        target_width (int): Pixel width the photos are shown at
 
     Returns:
         Document: Updated document
         bool: Whether photos were processed
     """
-    doc= Document(docx_path)
-    pneumatic_photos_folder = "uploads/Pneumatic"
-    image_paths = get_images_from_folder(pneumatic_photos_folder)
+    doc = open_docx(docx_path)
+    if doc is None or not hasattr(doc, 'paragraphs'):
+        return None, False
+
+    if category in job.extracted:
+        images = job.extracted[category]
+    else:
+        images = prepare_section_photos(job, category, target_width=target_width)
 
-    if not image_paths:
+    if not images:
         return doc, False
 
-    # Insert pneumatic photos at Pneumatic placeholder
-    doc, placeholder_found = insert_images_with_placeholder(
-        doc, "{{Upload_Pneumatic_Circuit_Here}}", image_paths
-    )
-    print("Inserted pneumatic photos into the document.")
-    doc.save(docx_path)
+    doc, placeholder_found = insert_images_with_placeholder(doc, placeholder, images, progress)
+    print(f"Inserted {label} photos into the document.")
+    save_docx(doc, docx_path)
     return doc, True
-   
+
 
 def remove_unused_placeholders(docx_path):
     """
     Remove any unused placeholders from the document.
 
     Args:
-        doc (Document): Document object
+        docx_path (str | Document): Path to the .docx file or an open Document
 
     Returns:
         Document: Updated document
     """
-    doc= Document(docx_path)
+    doc = open_docx(docx_path)
     placeholders = [
         "{{machine_photo}}",
         "{{Upload_Machine_Layout_here}}",
@@ -190,11 +170,8 @@ def remove_unused_placeholders(docx_path):
         "{{Upload_other_docs_here}}"
     ]
 
-    for i, para in enumerate(doc.paragraphs):
-        for placeholder in placeholders:
-            if placeholder in para.text:
-                para.text = para.text.replace(placeholder, "")
+    get_placeholder_index(doc).remove_placeholders(placeholders)
 
     print("Removed unused placeholders from the document.")
-    doc.save(docx_path)
+    save_docx(doc, docx_path)
     return doc
\ No newline at end of file
@@ -0,0 +1,255 @@
+import io
+import os
+import zipfile
+
+from bom_tables import build_bom_table, insert_table_before_placeholder, read_bom_rows
+from pdf_doc_extractor import RenderedPages, insert_pdf_section, open_pdf, prerender_pdf_section
+from pdf_renderer import FITZ_LOCK
+from utils import open_docx, open_source, save_docx
+
+ALARM_EXTENSIONS = (".pdf", ".xlsx", ".docx")
+
+# Characters of text a PDF needs on average per page to be read as text;
+# below this it is treated as a scan and its pages are inserted as images
+PDF_MIN_TEXT_CHARS = int(os.environ.get("ALARMS_PDF_MIN_TEXT_CHARS", 20))
+
+# Share of the words of a table found from text alignment alone that may be cut
+# by a column edge; above this it is read as prose and the PDF is rendered
+PDF_MAX_SPLIT_WORDS = float(os.environ.get("ALARMS_PDF_MAX_SPLIT_WORDS", 0.02))
+
+
+def _cell_text(text):
+    # Line breaks inside a cell become spaces; a table cell is one line in the manual
+    return " ".join((text or "").split())
+
+
+def _join_tables(tables):
+    """
+    Concatenate tables that continue each other into one list of rows.
+
+    The first row of the first table is the header; a later table starting
+    with the same row (a header repeated on every page) does not repeat it.
+    """
+    header = None
+    for rows in tables:
+        for index, row in enumerate(rows):
+            cells = [_cell_text(cell) for cell in row]
+            if not any(cells):
+                continue
+            if header is None:
+                header = cells
+            elif index == 0 and cells == header:
+                continue
+            yield cells
+
+
+def source_type(source):
+    """
+    Tell what kind of document an alarms upload is.
+
+    Args:
+        source (str | bytes): Path to the file, or its contents
+
+    Returns:
+        str: ".pdf", ".xlsx" or ".docx", or None when it is none of them
+    """
+    if isinstance(source, str):
+        extension = os.path.splitext(source)[1].lower()
+        return extension if extension in ALARM_EXTENSIONS else None
+    if source[:4] == b"%PDF":
+        return ".pdf"
+    try:
+        with zipfile.ZipFile(io.BytesIO(source)) as archive:
+            names = set(archive.namelist())
+    except zipfile.BadZipFile:
+        return None
+    if "word/document.xml" in names:
+        return ".docx"
+    if "xl/workbook.xml" in names:
+        return ".xlsx"
+    return None
+
+
+def read_docx_alarm_rows(source):
+    """
+    Read the rows of every table in a DOCX alarm list.
+
+    Args:
+        source (str | bytes): Path to the .docx file, or its contents
+
+    Returns:
+        iterator: Text of each non-empty row, header row first
+    """
+    from docx import Document
+    from docx.oxml.ns import qn
+
+    doc = Document(open_source(source))
+    tables = []
+    for table in doc.tables:
+        # One cell per w:tc, so a merged cell is read once rather than per grid column
+        tables.append([
+            [" ".join(p.text for p in tc.iterchildren(qn("w:p"))) for tc in tr.tc_lst]
+            for tr in table._tbl.tr_lst
+        ])
+    return _join_tables(tables)
+
+
+def _is_table_shaped(page, table):
+    """
+    Tell whether a table found from text alignment is a table rather than prose cut into columns.
+
+    It needs at least two columns and two rows, and its column edges must fall
+    between words: prose split by alignment has edges running through them.
+    """
+    if table.col_count < 2 or table.row_count < 2:
+        return False
+    edges = sorted({cell[0] for cell in table.cells if cell})[1:]
+    words = page.get_text("words", clip=table.bbox)
+    split = sum(any(word[0] < edge < word[2] for edge in edges) for word in words)
+    return split <= PDF_MAX_SPLIT_WORDS * len(words)
+
+
+def _page_tables(pdf, strategy):
+    """
+    Yield the extracted tables of each page, holding FITZ_LOCK for one page at a time.
+
+    Tables found with the "text" strategy are only yielded when they have the
+    shape of a table (see _is_table_shaped).
+    """
+    for number in range(pdf.page_count):
+        with FITZ_LOCK:
+            page = pdf[number]
+            tables = [
+                table.extract() for table in page.find_tables(strategy=strategy)
+                if strategy != "text" or _is_table_shaped(page, table)
+            ]
+        yield from tables
+
+
+def read_pdf_alarm_rows(source):
+    """
+    Read the tables of a PDF alarm list from its text layer.
+
+    Ruled tables are found from their lines; a PDF without ruling is split
+    into columns by the alignment of its text instead, which is only taken
+    as a table when it has the shape of one. FITZ_LOCK is taken per page, so
+    other sections' PDF work goes on during a long scan.
+
+    Args:
+        source (str | bytes): Path to the .pdf file, or its contents
+
+    Returns:
+        list: Text of each non-empty row, header row first, or None when the
+            PDF has no text layer (a scan) or no table could be found
+    """
+    with FITZ_LOCK:
+        pdf = open_pdf(source)
+    try:
+        text_chars = 0
+        for number in range(pdf.page_count):
+            with FITZ_LOCK:
+                text_chars += len(pdf[number].get_text().strip())
+        if text_chars < PDF_MIN_TEXT_CHARS * max(pdf.page_count, 1):
+            return None
+
+        for strategy in ("lines", "text"):
+            rows = list(_join_tables(_page_tables(pdf, strategy)))
+            if rows:
+                return rows
+        return None
+    finally:
+        with FITZ_LOCK:
+            pdf.close()
+
+
+def find_section_alarms(job, category, label):
+    """
+    Find the single alarms document uploaded to a job section.
+
+    Returns:
+        str | bytes: Path to the document or its contents when kept in memory,
+            or None when there is none or more than one
+    """
+    documents = job.input_files(category, ALARM_EXTENSIONS)
+    if len(documents) == 0:
+        print(f"⚠️ No PDF, XLSX or DOCX file found in {label} folder. Skipping.")
+        return None
+    elif len(documents) > 1:
+        print(f"⚠️ Multiple alarm documents found in {label} folder. Skipping.")
+        return None
+    return documents[0]
+
+
+def extract_alarms_section(job, category, label, progress=None, dpi=None):
+    """
+    Turn an alarms upload into a native table, or render it when it is a scan.
+
+    Spreadsheets and DOCX tables are read directly and PDFs from their text
+    layer, so the alarm codes stay searchable text in the manual. Only a PDF
+    without a text layer (or without any table in it) is rendered as pages.
+
+    Args:
+        job (Job): Job whose upload is read; the table (or the PDF to insert
+            as pages) is kept on job.extracted
+        category (str): Upload category, e.g. "Alarms"
+        label (str): Section name used in messages
+        progress (StageProgress): Advanced by the rows read or pages rendered
+        dpi (int): Render resolution of scanned pages (None sizes them to the manual)
+
+    Returns:
+        CT_Tbl | RenderedPages: The table element, the pages of the scanned
+            PDF, or None when the section has no usable upload
+    """
+    source = find_section_alarms(job, category, label)
+    kind = source_type(source) if source is not None else None
+    rows = None
+    if kind == ".xlsx":
+        rows = read_bom_rows(source)
+    elif kind == ".docx":
+        rows = read_docx_alarm_rows(source)
+    elif kind == ".pdf":
+        rows = read_pdf_alarm_rows(source)
+        if rows is None:
+            print(f"⚠️ {label} PDF has no text tables; inserting its pages as images.")
+            return prerender_pdf_section(job, category, label, progress, dpi=dpi)
+    elif source is not None:
+        print(f"⚠️ {label} upload is not a PDF, XLSX or DOCX file. Skipping.")
+
+    table = None
+    if rows is not None:
+        print(f"Reading {label} rows...")
+        table = build_bom_table(rows, progress)
+        if table is None:
+            print(f"⚠️ {label} document has no table rows.")
+    job.extracted[category] = table
+    return table
+
+
+def insert_alarms_section(job, docx_path, category, label, placeholder, progress=None, dpi=None):
+    """
+    Insert the alarms table (or the pages of a scanned PDF) at a placeholder.
+
+    Args:
+        job (Job): Job whose upload is inserted
+        docx_path (str | Document): Path to the .docx file or an open Document
+        category (str): Upload category, e.g. "Alarms"
+        label (str): Section name used in messages
+        placeholder (str): Placeholder the alarms go before
+        progress (StageProgress): Told the bytes of inserted page images
+        dpi (int): Render resolution of scanned pages (None sizes them to the manual)
+    """
+    if category not in job.extracted:
+        extract_alarms_section(job, category, label, dpi=dpi)
+    extracted = job.extracted[category]
+    if extracted is None:
+        return
+    if isinstance(extracted, RenderedPages):
+        insert_pdf_section(job, docx_path, category, label, placeholder, progress, dpi=dpi)
+        return
+
+    doc = open_docx(docx_path)
+    if insert_table_before_placeholder(doc, placeholder, extracted):
+        # The table now belongs to this document; a second insert must rebuild it
+        job.extracted.pop(category, None)
+        print(f"Inserted {label} table ({len(extracted.tr_lst)} rows) into the document.")
+    save_docx(doc, docx_path)
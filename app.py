@@ -1,9 +1,12 @@
 import streamlit as st
-import os
-import tempfile
-from utils import save_uploaded_file, validate_inputs
-from manual_generator import generate_manual
-from datetime import datetime
+import threading
+import time
+from utils import validate_inputs
+from job import Job
+from job_queue import (
+    DONE, FAILED, QUEUE_POLL_INTERVAL, generate_in_process, get_job_status, get_queue_stats, start_worker_pool, submit_job,
+)
+from progress import format_progress
 
 # Set page config
 st.set_page_config(
@@ -12,17 +15,41 @@ st.set_page_config(
     layout="wide"
 )
 
-# Create uploads directory and subdirectories if they don't exist
-upload_dirs = [
-    "uploads/DAP", "uploads/HMI", "uploads/Machine_Photos", "uploads/Layout_Photos",
-    "uploads/SOP", "uploads/SCADA", "uploads/Alarms", "uploads/MBOM", "uploads/EBOM",
-    "uploads/Pneumatic", "uploads/Laser_Doc", "uploads/E-PLAN_Drawing", 
-    "uploads/output"
-]
+# Manual generation runs in a pool of queue workers shared by all sessions
+@st.cache_resource
+def _worker_pool():
+    return start_worker_pool()
+
+_worker_pool()
+
 
-for directory in upload_dirs:
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+def generate_here(job):
+    """
+    Generate a small job in the app process, showing its progress meanwhile.
+
+    Returns:
+        SpooledTemporaryFile: The manual, or None when the job must be queued (see generate_in_process)
+    """
+    outcome = {}
+
+    def run():
+        try:
+            outcome["manual"] = generate_in_process(job, lambda event: outcome.__setitem__("event", event))
+        except Exception as e:
+            outcome["error"] = e
+
+    # Generated on its own thread so this script run can keep the progress bar current
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    bar = st.progress(0.0, text="Generating manual...")
+    while thread.is_alive():
+        thread.join(QUEUE_POLL_INTERVAL)
+        if "event" in outcome:
+            bar.progress(outcome["event"]["fraction"], text=format_progress(outcome["event"]))
+    bar.empty()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("manual")
 
 # Application title and description
 st.title("Product Manual Generator")
@@ -124,36 +151,19 @@ if submit_button:
     if not validation_result:
         st.error(f"Please fill in all required fields: {', '.join(missing_fields)}")
     else:
-        # Show progress
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        status_text.text("Creating temporary files...")
-        progress_bar.progress(10)
-        
-        # Prepare output directory
-        output_dir = os.path.join("uploads", "output", project_name.replace(" ", "_"))
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Save uploaded files to their respective category folders
-        status_text.text("Processing uploaded files...")
-        progress_bar.progress(20)
+        # Every submission gets its own workspace, so concurrent users never share files
+        job = Job()
         
-        # Save machine photos
+        # Hand the upload buffers to the job; it keeps them in memory unless they are large
         if machine_photos:
             for i, photo in enumerate(machine_photos):
-                file_path = os.path.join("uploads", "Machine_Photos", f"{i+1}_{photo.name}")
-                with open(file_path, "wb") as f:
-                    f.write(photo.getbuffer())
+                job.add_input("Machine_Photos", f"{i+1}_{photo.name}", photo.getbuffer())
         
-        # Save layout photos
         if layout_photos:
             for i, photo in enumerate(layout_photos):
-                file_path = os.path.join("uploads", "Layout_Photos", f"{i+1}_{photo.name}")
-                with open(file_path, "wb") as f:
-                    f.write(photo.getbuffer())
+                job.add_input("Layout_Photos", f"{i+1}_{photo.name}", photo.getbuffer())
         
-        # Save individual document files
+        # Individual document files
         doc_files = {
             "DAP": dap_file,
             "SOP": sop_file,
@@ -164,63 +174,91 @@ if submit_button:
             "EBOM": ebom_file,
             "Pneumatic": pneumatic_file,
             "Laser_Doc": laser_doc,
-            "Electrical_Circuit_Diagram": eplan_drawing
+            "E-PLAN_Drawing": eplan_drawing
         }
         
         for doc_type, file in doc_files.items():
             if file:
-                file_path = os.path.join("uploads", doc_type, file.name)
-                with open(file_path, "wb") as f:
-                    f.write(file.getbuffer())
+                job.add_input(doc_type, file.name, file.getbuffer())
         
-        # Prepare project info and electrical specifications
-        project_info = {
+        # Project info and electrical specifications, in the Project_info.txt
+        # format the pipeline reads
+        job.write_project_info({
             "project_name": project_name,
             "customer": customer,
             "project_no": project_no,
             "manual_date": manual_date.strftime("%Y-%m-%d"),
-            "additional_info": machine_specs,
+            "machine_specs": machine_specs,
             "robot_part_no": robot_part_no,
-            "leak_test_part_no": leak_test_part_no
-        }
-        
-        electrical_specs = {
-            "voltage": voltage,
-            "current": current,
-            "power": power,
-            "frequency": frequency
-        }
+            "leak_test_part_no": leak_test_part_no,
+            "Voltage": voltage,
+            "Current": current,
+            "Power": power,
+            "Frequency": frequency
+        })
         
-        status_text.text("Processing and analyzing documents...")
-        progress_bar.progress(40)
-        
-        # Generate the manual using our new module
+        st.session_state.pop("job_id", None)
+        st.session_state.pop("manual_file", None)
+        st.session_state["job_project_name"] = project_name
         try:
-            status_text.text("Generating manual - This may take a few moments...")
-            progress_bar.progress(60)
-            
-            # Generate the manual
-            output_file = generate_manual(project_info, electrical_specs, output_dir)
-            
-            progress_bar.progress(90)
-            
-            # Read the generated file
-            with open(output_file, "rb") as file:
-                status_text.text("Manual generated successfully!")
-                progress_bar.progress(100)
-                
-                # Provide download button
-                st.success("Your product manual has been generated successfully!")
-                file_data = file.read()
-                
-                st.download_button(
-                    label="Download Product Manual",
-                    data=file_data,
-                    file_name=f"{project_name}_Manual.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                )
+            # A small job is generated right away, without writing anything to disk
+            manual = generate_here(job)
         except Exception as e:
+            job.cleanup()
             st.error(f"Error generating manual: {str(e)}")
             st.error("Please check that you've provided valid files and try again.")
-            progress_bar.empty()
-            status_text.empty()
\ No newline at end of file
+        else:
+            if manual is not None:
+                job.cleanup()
+                st.session_state["manual_file"] = manual
+            else:
+                # Hand the job to the queue; the page polls it below
+                st.session_state["job_id"] = submit_job(job)
+
+# Offer a manual generated in this process
+if "manual_file" in st.session_state:
+    st.success("Your product manual has been generated successfully!")
+    manual = st.session_state["manual_file"]
+    manual.seek(0)
+    st.download_button(
+        label="Download Product Manual",
+        data=manual,
+        file_name=f"{st.session_state['job_project_name']}_Manual.docx",
+        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    )
+
+# Show the state of this session's queued job
+elif "job_id" in st.session_state:
+    status = get_job_status(st.session_state["job_id"])
+    stats = get_queue_stats()
+    st.caption(
+        f"Queue: {stats['queued']} waiting, {stats['running']} running · "
+        f"average wait {stats['avg_wait_s']:.0f}s, average run {stats['avg_run_s']:.0f}s"
+    )
+    
+    if status is None:
+        st.error("This job is no longer available. Please submit the form again.")
+        del st.session_state["job_id"]
+    elif status["status"] == DONE:
+        st.success(f"Your product manual has been generated successfully! (waited {status['wait_s']:.0f}s, ran {status['run_s']:.0f}s)")
+        with open(status["output_file"], "rb") as file:
+            st.download_button(
+                label="Download Product Manual",
+                data=file,
+                file_name=f"{st.session_state['job_project_name']}_Manual.docx",
+                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+            )
+    elif status["status"] == FAILED:
+        st.error(f"Error generating manual: {status['error']}")
+        st.error("Please check that you've provided valid files and try again.")
+    else:
+        if status["position"]:
+            st.info(f"Waiting in queue (position {status['position']}, {status['wait_s']:.0f}s so far)...")
+        elif status["progress"]:
+            event = status["progress"]
+            st.progress(event["fraction"], text=format_progress(event))
+            st.caption(f"Running for {status['run_s']:.0f}s")
+        else:
+            st.info(f"Generating manual - This may take a few moments... ({status['run_s']:.0f}s so far)")
+        time.sleep(QUEUE_POLL_INTERVAL)
+        st.rerun()
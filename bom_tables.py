@@ -0,0 +1,263 @@
+import datetime
+import os
+import re
+from xml.sax.saxutils import escape
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+from image_sizing import DISPLAY_WIDTH_IN
+from placeholder_index import find_placeholder
+from utils import open_docx, open_source, save_docx
+
+# Rows parsed into the table per lxml call; bounds the XML text held at once
+BOM_CHUNK_ROWS = int(os.environ.get("BOM_CHUNK_ROWS", 1000))
+
+# Font size of BOM tables in half-points (8 pt keeps wide BOMs on the page)
+BOM_FONT_HALF_POINTS = 16
+
+# Width of the table in fiftieths of a percent (5000 = full text width)
+_FULL_WIDTH_PCT = 5000
+
+# Width the columns share, in twentieths of a point
+_TABLE_WIDTH_TWIPS = int(DISPLAY_WIDTH_IN * 1440)
+
+# Characters XML 1.0 does not allow, which spreadsheets occasionally contain
+_INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_RUN_PROPERTIES = f'<w:rPr><w:sz w:val="{BOM_FONT_HALF_POINTS}"/></w:rPr>'
+_HEADER_RUN_PROPERTIES = f'<w:rPr><w:b/><w:sz w:val="{BOM_FONT_HALF_POINTS}"/></w:rPr>'
+
+
+def format_cell(value):
+    """
+    Format a spreadsheet value the way it is shown in the manual.
+
+    Args:
+        value: Cell value from openpyxl
+
+    Returns:
+        str: Display text ("" for empty cells, 2 rather than 2.0, dates without time)
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        return value.date().isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def read_bom_rows(source):
+    """
+    Stream the rows of a BOM workbook.
+
+    The first sheet is read in openpyxl's read-only mode, which parses the
+    sheet XML as it goes, so memory stays flat however many rows there are.
+
+    Args:
+        source (str | bytes): Path to the .xlsx file, or its contents
+
+    Yields:
+        list: Display text of each non-empty row, header row first
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(open_source(source), read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        for row in sheet.iter_rows(values_only=True):
+            cells = [format_cell(value) for value in row]
+            if any(cells):
+                yield cells
+    finally:
+        workbook.close()
+
+
+def _row_xml(cells, header=False):
+    run_properties = _HEADER_RUN_PROPERTIES if header else _RUN_PROPERTIES
+    row_properties = "<w:trPr><w:tblHeader/><w:cantSplit/></w:trPr>" if header else "<w:trPr><w:cantSplit/></w:trPr>"
+    return "<w:tr>" + row_properties + "".join(
+        f'<w:tc><w:p><w:r>{run_properties}<w:t xml:space="preserve">{escape(_INVALID_XML_CHARS.sub("", text))}</w:t></w:r></w:p></w:tc>'
+        for text in cells
+    ) + "</w:tr>"
+
+
+def build_bom_table(rows, progress=None, total=None):
+    """
+    Build a DOCX table from BOM rows in bulk.
+
+    Rows are rendered to table XML as text and parsed BOM_CHUNK_ROWS at a
+    time, instead of one table.add_row() per row, whose cost grows with the
+    table. The first row is the header; it repeats on every page. The layout
+    is fixed, so Word does not measure every cell to autofit 50k rows.
+
+    Args:
+        rows (iterable): Lists of cell text, header first (see read_bom_rows)
+        progress (StageProgress): Advanced by the rows added
+        total (int): Rows expected, if known
+
+    Returns:
+        CT_Tbl: The w:tbl element, not yet part of any document, or None when
+            there are no rows
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return None
+    # The header defines the columns; trailing unnamed columns are dropped
+    while len(header) > 1 and not header[-1]:
+        header.pop()
+    columns = len(header)
+
+    grid_column = f'<w:gridCol w:w="{_TABLE_WIDTH_TWIPS // columns}"/>'
+    borders = "".join(
+        f'<w:{side} w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+        for side in ("top", "left", "bottom", "right", "insideH", "insideV")
+    )
+    table = parse_xml(
+        f"<w:tbl {nsdecls('w')}>"
+        f'<w:tblPr><w:tblW w:w="{_FULL_WIDTH_PCT}" w:type="pct"/><w:tblBorders>{borders}</w:tblBorders>'
+        f'<w:tblLayout w:type="fixed"/></w:tblPr>'
+        f"<w:tblGrid>{grid_column * columns}</w:tblGrid>"
+        f"{_row_xml(header, header=True)}"
+        "</w:tbl>"
+    )
+    if progress is not None:
+        progress.update(total=total, unit="rows", advance=1)
+
+    chunk = []
+
+    def flush():
+        fragment = parse_xml(f"<w:tbl {nsdecls('w')}>{''.join(chunk)}</w:tbl>")
+        # Moves the parsed rows into the table
+        table.extend(list(fragment))
+        if progress is not None:
+            progress.update(advance=len(chunk))
+        chunk.clear()
+
+    for cells in rows:
+        cells = (cells + [""] * columns)[:columns]
+        chunk.append(_row_xml(cells))
+        if len(chunk) >= BOM_CHUNK_ROWS:
+            flush()
+    if chunk:
+        flush()
+    return table
+
+
+def _insert_table_before(table, anchor):
+    # lxml moves a subtree into another document in time that grows faster
+    # than its size, so a 50k-row table is moved a chunk of rows at a time
+    rows = table.tr_lst
+    for row in rows:
+        table.remove(row)
+    anchor.addprevious(table)
+    for start in range(0, len(rows), BOM_CHUNK_ROWS):
+        table.extend(rows[start:start + BOM_CHUNK_ROWS])
+
+
+def insert_table_before_placeholder(doc, placeholder, table, heading=None):
+    """
+    Insert a table built by build_bom_table before a placeholder paragraph.
+
+    The placeholder itself is left in place for remove_unused_placeholders,
+    so several tables can share one placeholder and keep their order.
+
+    Args:
+        doc (Document): Open document
+        placeholder (str): Placeholder the table goes before
+        table (CT_Tbl): Table element, moved into the document
+        heading (str): Bold paragraph shown above the table, if any
+
+    Returns:
+        bool: False when the placeholder is not in the document
+    """
+    para = find_placeholder(doc, placeholder)
+    if para is None:
+        print(f"⚠️ Placeholder '{placeholder}' not found; table not inserted.")
+        return False
+
+    if heading:
+        para._p.addprevious(parse_xml(
+            f'<w:p {nsdecls("w")}><w:r><w:rPr><w:b/></w:rPr><w:t>{escape(heading)}</w:t></w:r></w:p>'
+        ))
+    _insert_table_before(table, para._p)
+    return True
+
+
+def find_section_workbook(job, category, label):
+    """
+    Find the single workbook uploaded to a job section.
+
+    Returns:
+        str | bytes: Path to the workbook or its contents when kept in memory,
+            or None when there is none or more than one
+    """
+    workbooks = job.input_files(category, (".xlsx",))
+    if len(workbooks) == 0:
+        print(f"⚠️ No XLSX file found in {label} folder. Skipping.")
+        return None
+    elif len(workbooks) > 1:
+        print(f"⚠️ Multiple XLSX files found in {label} folder. Skipping.")
+        return None
+    return workbooks[0]
+
+
+def extract_bom_section(job, category, label, progress=None):
+    """
+    Read a BOM workbook and build its table.
+
+    Runs as an extraction stage alongside the other sections, so the table is
+    ready to be dropped into the document when the section is inserted.
+
+    Args:
+        job (Job): Job whose upload is read; the table is kept on job.extracted
+        category (str): Upload category, e.g. "MBOM"
+        label (str): Section name used in messages
+        progress (StageProgress): Advanced by the rows read
+
+    Returns:
+        CT_Tbl: The table element, or None when the section has no workbook
+    """
+    table = None
+    workbook = find_section_workbook(job, category, label)
+    if workbook is not None:
+        print(f"Reading {label} rows...")
+        table = build_bom_table(read_bom_rows(workbook), progress)
+        if table is None:
+            print(f"⚠️ {label} workbook has no rows.")
+    job.extracted[category] = table
+    return table
+
+
+def insert_bom_section(job, docx_path, category, label, placeholder, progress=None):
+    """
+    Insert a BOM table, under a heading with its label, before a placeholder.
+
+    The placeholder itself is left in place (remove_unused_placeholders clears
+    it), so several BOMs can share one placeholder and keep their order.
+
+    Args:
+        job (Job): Job whose upload is inserted
+        docx_path (str | Document): Path to the .docx file or an open Document
+        category (str): Upload category, e.g. "EBOM"
+        label (str): Heading shown above the table
+        placeholder (str): Placeholder the table goes before
+        progress (StageProgress): Unused; the rows are reported while the table is built
+    """
+    if category in job.extracted:
+        table = job.extracted[category]
+    else:
+        table = extract_bom_section(job, category, label)
+    if table is None:
+        return
+
+    doc = open_docx(docx_path)
+    if insert_table_before_placeholder(doc, placeholder, table, heading=label):
+        # The table now belongs to this document; a second insert must rebuild it
+        job.extracted.pop(category, None)
+        print(f"Inserted {label} table ({len(table.tr_lst)} rows) into the document.")
+    save_docx(doc, docx_path)
@@ -0,0 +1,224 @@
+import hashlib
+import io
+import os
+import threading
+
+# Turn off to process every slide and page on its own
+DEDUP_ENABLED = os.environ.get("MANUAL_DEDUP", "1") != "0"
+
+# Decode an encoded image whose bytes match no earlier one, to find the same
+# pixels encoded differently; off, only byte-identical images are duplicates
+DEDUP_COMPARE_PIXELS = os.environ.get("MANUAL_DEDUP_PIXELS", "1") != "0"
+
+
+def fingerprint(image):
+    """
+    Digest the decoded pixels of an image.
+
+    Two images are duplicates only when every pixel is the same, so slides
+    that differ in a single value or word (one HMI screen showing other
+    readings) are never merged, however alike they look.
+
+    Args:
+        image (str | bytes | Image.Image): Image path, encoded bytes or decoded image
+
+    Returns:
+        str: SHA1 of the image's mode, size and pixels
+    """
+    from PIL import Image
+
+    if isinstance(image, (bytes, bytearray)):
+        image = io.BytesIO(image)
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+        image.load()
+    digest = hashlib.sha1(f"{image.mode}{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def _digests(image):
+    """
+    Yield the digests an image is looked up by, cheapest first.
+
+    An encoded image is known by the SHA1 of its bytes, then (MANUAL_DEDUP_PIXELS)
+    by its pixels; a decoded image only by its pixels.
+    """
+    if isinstance(image, (str, os.PathLike)):
+        with open(image, "rb") as f:
+            image = f.read()
+    if not isinstance(image, (bytes, bytearray)):
+        yield fingerprint(image)
+        return
+    yield "bytes:" + hashlib.sha1(image).hexdigest()
+    if DEDUP_COMPARE_PIXELS:
+        yield fingerprint(image)
+
+
+class DedupBatch:
+    """
+    The images of one lookup in a DedupIndex.
+
+    Attributes:
+        known (dict): key -> value reused from an earlier duplicate
+        unique (dict): key -> image whose value must be computed; every other
+            key of the batch is a duplicate of one of these or of a known image
+    """
+
+    def __init__(self, index, kind, keys, digests):
+        self.index = index
+        self.kind = kind
+        self.keys = keys
+        # key -> digests the image is known by (encoded bytes and/or pixels)
+        self.digests = digests
+        self.known = {}
+        self.unique = {}
+        # key -> key of the first image in the batch it duplicates
+        self.originals = {}
+
+    def resolve(self, values):
+        """
+        Record the values computed for the unique images and spread them to their duplicates.
+
+        Args:
+            values (dict): key -> value for every key in unique
+
+        Returns:
+            dict: key -> value for every key of the batch
+        """
+        results = dict(self.known)
+        for key in self.keys:
+            if key in self.originals:
+                results[key] = values[self.originals[key]]
+        duplicates = [results[key] for key in self.keys if key not in self.unique]
+        bytes_saved = sum(len(value) for value in duplicates if isinstance(value, (bytes, bytearray)))
+        self.index._add(self, results, len(duplicates), bytes_saved)
+        return results
+
+
+class DedupIndex:
+    """
+    Rendered slides and pages of one manual, indexed by the digest of their pixels.
+
+    Sections look their images up before OCR'ing or encoding them, and reuse
+    the result of an earlier duplicate (in the same deck or another section)
+    instead. Identical encoded bytes are then stored once in the DOCX package,
+    which python-docx already does by SHA1. Safe to share between the
+    extraction stages of a job.
+
+    Rendering is deterministic, so an encoded image is first looked up by the
+    SHA1 of its bytes and only decoded when that finds nothing.
+    """
+
+    def __init__(self, enabled=None):
+        """
+        Args:
+            enabled (bool): Look for duplicates (MANUAL_DEDUP); when False every image is unique
+        """
+        self.enabled = DEDUP_ENABLED if enabled is None else enabled
+        self._lock = threading.Lock()
+        # kind -> {digest of encoded bytes or pixels: value}
+        self._entries = {}
+        # kind -> {"items", "duplicates", "bytes_saved"}
+        self._stats = {}
+
+    def match(self, kind, images):
+        """
+        Find which images duplicate one already in the index or earlier in the batch.
+
+        Args:
+            kind (str): What the images are, e.g. "slide_heading"; only images
+                of the same kind are compared
+            images (dict): key -> image (path, encoded bytes or decoded image)
+
+        Returns:
+            DedupBatch: Pass the values computed for batch.unique to batch.resolve()
+        """
+        keys = list(images)
+        if not self.enabled:
+            batch = DedupBatch(self, kind, keys, None)
+            batch.unique = dict(images)
+            batch.originals = {key: key for key in keys}
+            return batch
+
+        batch = DedupBatch(self, kind, keys, {})
+        with self._lock:
+            known = dict(self._entries.get(kind, {}))
+
+        # digest -> key of the first image of this batch with it
+        first = {}
+        for key in keys:
+            digests = batch.digests[key] = []
+            # Later digests are only computed when the earlier ones find nothing
+            for digest in _digests(images[key]):
+                digests.append(digest)
+                if digest in known:
+                    batch.known[key] = known[digest]
+                    break
+                if digest in first:
+                    batch.originals[key] = first[digest]
+                    break
+            else:
+                batch.unique[key] = images[key]
+                batch.originals[key] = key
+
+            for digest in digests:
+                if key in batch.known:
+                    known.setdefault(digest, batch.known[key])
+                else:
+                    first.setdefault(digest, batch.originals[key])
+        return batch
+
+    def _add(self, batch, results, duplicates, bytes_saved):
+        if not batch.keys:
+            return
+        with self._lock:
+            stats = self._stats.setdefault(batch.kind, {"items": 0, "duplicates": 0, "bytes_saved": 0})
+            stats["items"] += len(batch.keys)
+            stats["duplicates"] += duplicates
+            stats["bytes_saved"] += bytes_saved
+
+            if batch.digests is None:
+                return
+            # Every digest an image was looked up by now leads to its value, so
+            # the next copy of the same bytes is found without decoding
+            entries = self._entries.setdefault(batch.kind, {})
+            for key, digests in batch.digests.items():
+                for digest in digests:
+                    entries.setdefault(digest, results[key])
+
+    def report(self):
+        """
+        Summarize the duplicates found so far.
+
+        Returns:
+            dict: kind -> {"items": images looked up, "duplicates": images that
+                reused an earlier result, "bytes_saved": encoded bytes not
+                produced again}
+        """
+        with self._lock:
+            return {kind: dict(stats) for kind, stats in self._stats.items()}
+
+
+def format_dedup_report(report, media=None):
+    """
+    Format a dedup report for the console.
+
+    Args:
+        report (dict): DedupIndex.report()
+        media (tuple): (image references, media parts) in the finished manual
+
+    Returns:
+        str: One line per kind of image that was looked up
+    """
+    lines = []
+    for kind, stats in report.items():
+        if not stats["items"]:
+            continue
+        line = f"♻️ {kind}: {stats['duplicates']} of {stats['items']} duplicate(s) reused"
+        if stats["bytes_saved"]:
+            line += f", {stats['bytes_saved'] / 1024:.0f} KB not encoded again"
+        lines.append(line)
+    if media is not None and media[0]:
+        lines.append(f"♻️ {media[0]} image(s) in the manual stored as {media[1]} media part(s)")
+    return "\n".join(lines)
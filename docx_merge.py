@@ -0,0 +1,334 @@
+import copy
+import io
+import re
+
+from placeholder_index import find_placeholder
+from utils import open_docx, open_source, save_docx
+
+_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_WP = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+
+# Numbering part given to a template that has none (python-docx cannot create one)
+_EMPTY_NUMBERING = f'<w:numbering xmlns:w="{_W}"/>'.encode()
+
+# SmartArt data points at its cached drawing through a relationship of the document part
+_DIAGRAM_DRAWING_REFERENCE = re.compile(rb'(<[\w:]*dataModelExt\b[^>]*?\brelId=")([^"]+)(")')
+
+# Style references in the body and the style attributes that point at other styles
+_STYLE_REFERENCES = {f"{{{_W}}}{tag}" for tag in ("pStyle", "rStyle", "tblStyle")}
+_STYLE_LINKS = [f"{{{_W}}}{tag}" for tag in ("basedOn", "link", "next")]
+
+# Body content that points into parts of the source document that are not merged
+_UNMERGED_REFERENCES = {
+    f"{{{_W}}}{tag}" for tag in (
+        "sectPr", "footnoteReference", "endnoteReference",
+        "commentReference", "commentRangeStart", "commentRangeEnd",
+    )
+}
+
+
+def find_section_docx(job, category):
+    """
+    Find the single .docx file uploaded to a job section.
+
+    Args:
+        job (Job): Job to look in
+        category (str): Upload category, e.g. "SOP"
+
+    Returns:
+        str | bytes: Path to the document or its contents when kept in memory,
+            or None when there is none or more than one
+    """
+    documents = job.input_files(category, (".docx",))
+    if len(documents) > 1:
+        print(f"⚠️ Multiple DOCX files found in {category} folder. Skipping.")
+        return None
+    return documents[0] if documents else None
+
+
+def _w(element, name):
+    return element.get(f"{{{_W}}}{name}")
+
+
+def _is_readable_image(blob):
+    """Whether python-docx can read an image's header (PNG, JPEG, GIF, TIFF or BMP)."""
+    from docx.image import SIGNATURES
+
+    return any(blob[offset:offset + len(signature)] == signature for _, offset, signature in SIGNATURES)
+
+
+def _numbering(document, create=False):
+    """The numbering element of a document, adding a numbering part to it when asked."""
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+
+    try:
+        return document.part.part_related_by(RT.NUMBERING).element
+    except KeyError:
+        if not create:
+            return None
+
+    from docx.opc.constants import CONTENT_TYPE as CT
+    from docx.opc.packuri import PackURI
+    from docx.parts.numbering import NumberingPart
+
+    package = document.part.package
+    numbering_part = NumberingPart.load(
+        PackURI(package.next_partname("/word/numbering%d.xml")), CT.WML_NUMBERING, _EMPTY_NUMBERING, package)
+    document.part.relate_to(numbering_part, RT.NUMBERING)
+    return numbering_part.element
+
+
+class _BodyMerge:
+    """Moves the body of one document into another, one source part at a time."""
+
+    def __init__(self, target, source):
+        self.target = target
+        self.source = source
+        self.relationships = {}
+        self.adopted_parts = set()
+        self.bytes_added = 0
+        self.numbering = {}
+        self.next_abstract_id = None
+        self.next_num_id = None
+
+    def relationship(self, r_id):
+        """Relationship id in the target for one in the source."""
+        if r_id in self.relationships:
+            return self.relationships[r_id]
+        rel = self.source.part.rels.get(r_id)
+        if rel is None:
+            return r_id
+
+        from docx.opc.constants import RELATIONSHIP_TYPE as RT
+
+        if rel.is_external:
+            new_id = self.target.part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+        elif rel.reltype == RT.IMAGE and _is_readable_image(rel.target_part.blob):
+            # Identical images are stored once in the package (matched by SHA1)
+            new_id, _ = self.target.part.get_or_add_image(io.BytesIO(rel.target_part.blob))
+            self.bytes_added += len(rel.target_part.blob)
+        else:
+            # Charts, SmartArt, embedded objects and vector images (EMF, WMF,
+            # SVG) come along with their own parts
+            self._adopt_part(rel.target_part)
+            new_id = self.target.part.relate_to(rel.target_part, rel.reltype)
+            if rel.reltype == RT.DIAGRAM_DATA:
+                self._relate_diagram_drawing(rel.target_part)
+        self.relationships[r_id] = new_id
+        return new_id
+
+    def _adopt_part(self, part):
+        if part in self.adopted_parts:
+            return
+        self.adopted_parts.add(part)
+        # Renamed so it cannot collide with a part of the same name in the template
+        template = re.sub(r"\d*(\.\w+)$", r"%d\1", str(part.partname))
+        part.partname = self.target.part.package.next_partname(template)
+        if not hasattr(part, "element"):
+            self.bytes_added += len(part.blob)
+        for rel in part.rels.values():
+            if not rel.is_external:
+                self._adopt_part(rel.target_part)
+
+    def _relate_diagram_drawing(self, part):
+        """Point a SmartArt data part at its drawing as related from the target."""
+        def remap(match):
+            return match.group(1) + self.relationship(match.group(2).decode()).encode() + match.group(3)
+
+        part._blob = _DIAGRAM_DRAWING_REFERENCE.sub(remap, part.blob)
+
+    def copy_styles(self, style_ids):
+        """Copy the styles the template lacks, with the styles they are based on."""
+        target_styles = self.target.styles.element
+        existing = {_w(style, "styleId") for style in target_styles.iterchildren(f"{{{_W}}}style")}
+        source_styles = {
+            _w(style, "styleId"): style
+            for style in self.source.styles.element.iterchildren(f"{{{_W}}}style")
+        }
+        copied = []
+        pending = list(style_ids)
+        while pending:
+            style_id = pending.pop()
+            if style_id in existing or style_id not in source_styles:
+                continue
+            existing.add(style_id)
+            style = copy.deepcopy(source_styles[style_id])
+            target_styles.append(style)
+            copied.append(style)
+            for link in _STYLE_LINKS:
+                for child in style.iterchildren(link):
+                    pending.append(_w(child, "val"))
+        return copied
+
+    def number_id(self, num_id):
+        """Numbering id in the target for one in the source, copying its list definition."""
+        if num_id == "0" or num_id in self.numbering:
+            return self.numbering.get(num_id, num_id)
+
+        source_numbering = _numbering(self.source)
+        if source_numbering is None:
+            return num_id
+        num = next((n for n in source_numbering.iterchildren(f"{{{_W}}}num") if _w(n, "numId") == num_id), None)
+        if num is None:
+            return num_id
+        abstract_ref = num.find(f"{{{_W}}}abstractNumId")
+        abstract = next(
+            (a for a in source_numbering.iterchildren(f"{{{_W}}}abstractNum")
+             if abstract_ref is not None and _w(a, "abstractNumId") == _w(abstract_ref, "val")),
+            None,
+        )
+
+        target_numbering = _numbering(self.target, create=True)
+        if self.next_num_id is None:
+            self.next_num_id = 1 + max(
+                [int(_w(n, "numId")) for n in target_numbering.iterchildren(f"{{{_W}}}num")] or [0])
+            self.next_abstract_id = 1 + max(
+                [int(_w(a, "abstractNumId")) for a in target_numbering.iterchildren(f"{{{_W}}}abstractNum")] or [-1])
+
+        num = copy.deepcopy(num)
+        num.set(f"{{{_W}}}numId", str(self.next_num_id))
+        if abstract is not None:
+            abstract = copy.deepcopy(abstract)
+            abstract.set(f"{{{_W}}}abstractNumId", str(self.next_abstract_id))
+            num.find(f"{{{_W}}}abstractNumId").set(f"{{{_W}}}val", str(self.next_abstract_id))
+            # Every abstractNum must come before the first num
+            first_num = target_numbering.find(f"{{{_W}}}num")
+            if first_num is not None:
+                first_num.addprevious(abstract)
+            else:
+                target_numbering.append(abstract)
+            self.next_abstract_id += 1
+        target_numbering.append(num)
+
+        self.numbering[num_id] = str(self.next_num_id)
+        self.next_num_id += 1
+        return self.numbering[num_id]
+
+    def renumber(self, elements):
+        """Point the numbering references of elements at the target's lists."""
+        for element in elements:
+            for num_id in element.iter(f"{{{_W}}}numId"):
+                num_id.set(f"{{{_W}}}val", self.number_id(_w(num_id, "val")))
+
+
+def merge_docx_body(docx_path, source, placeholder, progress=None):
+    """
+    Merge the body of a Word document into the manual at a placeholder.
+
+    The source body is moved into the manual as XML in one pass, so merging
+    takes time linear in the document and nothing is rendered. Everything
+    the body points to comes along: images (stored once per distinct image),
+    hyperlinks, charts, SmartArt and embedded objects, and the styles and numbered
+    lists the template does not already define. Section properties, headers,
+    footers, footnotes and comments of the source are not merged.
+
+    Args:
+        docx_path (str | Document): Path to the .docx file or an open Document
+        source (str | bytes | Document): Document to merge, as a path, its
+            contents or an already parsed Document (which is emptied)
+        placeholder (str): Placeholder the body replaces
+        progress (StageProgress): Told the bytes of the images and parts merged
+
+    Returns:
+        int: Number of top-level body elements merged
+    """
+    doc = open_docx(docx_path)
+    if isinstance(source, (str, bytes, bytearray)):
+        from docx import Document
+
+        source = Document(open_source(source))
+
+    para = find_placeholder(doc, placeholder)
+    if para is None:
+        print(f"⚠️ Placeholder '{placeholder}' not found; document not merged.")
+        return 0
+
+    merge = _BodyMerge(doc, source)
+    style_ids = set()
+    docpr_ids = [int(docpr.get("id", 0)) for docpr in doc.element.body.iter(f"{{{_WP}}}docPr")]
+    next_docpr_id = max(docpr_ids or [0]) + 1
+
+    body = [child for child in source.element.body if child.tag != f"{{{_W}}}sectPr"]
+    for child in body:
+        # Dropped first, so nothing they point to (headers of a section break) is pulled in
+        for element in [e for e in child.iter(*_UNMERGED_REFERENCES)]:
+            element.getparent().remove(element)
+        for element in child.iter():
+            # Every r: attribute is a relationship id (r:id, r:embed, SmartArt's r:dm, ...)
+            for name, value in [(name, value) for name, value in element.items() if name.startswith(f"{{{_R}}}")]:
+                if value:
+                    element.set(name, merge.relationship(value))
+            if element.tag in _STYLE_REFERENCES:
+                style_ids.add(_w(element, "val"))
+            elif element.tag == f"{{{_WP}}}docPr":
+                # Drawing ids must be unique within the document
+                element.set("id", str(next_docpr_id))
+                next_docpr_id += 1
+
+    merge.renumber(body + merge.copy_styles(style_ids))
+
+    # Moved one top-level element at a time, which keeps lxml's move linear
+    for child in body:
+        para._p.addprevious(child)
+    para.text = para.text.replace(placeholder, "").strip()
+
+    if progress is not None:
+        # The assembly stage counts sections; a merge only adds to its bytes
+        progress.update(bytes_written=merge.bytes_added)
+    print(f"Merged {len(body)} body elements into the document.")
+    save_docx(doc, docx_path)
+    return len(body)
+
+
+def extract_docx_section(job, category, label, progress=None):
+    """
+    Parse a section's .docx upload ahead of its merge.
+
+    Args:
+        job (Job): Job whose upload is parsed; the Document is kept on job.extracted
+        category (str): Upload category, e.g. "SOP"
+        label (str): Section name used in messages
+        progress (StageProgress): Unused; the merge is reported when inserted
+
+    Returns:
+        Document: The parsed upload, or None when the section has no .docx file
+    """
+    from docx import Document
+
+    source = find_section_docx(job, category)
+    if source is None:
+        return None
+    print(f"Reading {label} document...")
+    document = Document(open_source(source))
+    job.extracted[category] = document
+    return document
+
+
+def insert_docx_section(job, docx_path, category, label, placeholder, progress=None):
+    """
+    Merge a section's .docx upload into the manual at its placeholder.
+
+    Args:
+        job (Job): Job whose upload is merged
+        docx_path (str | Document): Path to the .docx file or an open Document
+        category (str): Upload category, e.g. "Pneumatic"
+        label (str): Section name used in messages
+        placeholder (str): Placeholder the document replaces
+        progress (StageProgress): Told the bytes of the images and parts merged
+
+    Returns:
+        bool: True when the section had a .docx upload and it was merged
+    """
+    from docx.document import Document
+
+    source = job.extracted.get(category)
+    if not isinstance(source, Document):
+        source = find_section_docx(job, category)
+    if source is None:
+        return False
+    print(f"Merging {label} document...")
+    merge_docx_body(docx_path, source, placeholder, progress)
+    # The parsed upload has been emptied into the manual
+    job.extracted.pop(category, None)
+    return True
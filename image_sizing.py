@@ -0,0 +1,210 @@
+import io
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+# Width images are placed at in the manual (matches Inches(6) in the inserters)
+DISPLAY_WIDTH_IN = 6.0
+
+# Resolution the printed/zoomed manual actually needs at that width
+EFFECTIVE_DPI = int(os.environ.get("MANUAL_EFFECTIVE_DPI", 200))
+
+JPEG_QUALITY = int(os.environ.get("MANUAL_JPEG_QUALITY", 85))
+MIN_RENDER_DPI = 36
+MAX_RENDER_DPI = 300
+
+# Line art: this many most common colours cover at least this share of the pixels
+LINE_ART_COLORS = 32
+LINE_ART_COVERAGE = 0.95
+
+PHOTO_PREP_WORKERS = int(os.environ.get("PHOTO_PREP_WORKERS", min(8, (os.cpu_count() or 1) + 2)))
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def target_pixel_width(display_width_in=DISPLAY_WIDTH_IN, effective_dpi=None):
+    """
+    Get the pixel width an image needs to be shown at display_width_in.
+
+    Returns:
+        int: Width in pixels
+    """
+    return round(display_width_in * (effective_dpi or EFFECTIVE_DPI))
+
+
+def render_dpi_for_width(page_width_pt, display_width_in=DISPLAY_WIDTH_IN, effective_dpi=None):
+    """
+    Get the render DPI at which a page comes out exactly as wide as it is displayed.
+
+    An A3 drawing (16.5 in wide) shown at 6 in and 200 effective dpi only
+    needs to be rendered at 73 dpi, not 300.
+
+    Args:
+        page_width_pt (float): Page width in points
+        display_width_in (float): Width the page is shown at in the manual
+        effective_dpi (int): Resolution needed at that width
+
+    Returns:
+        int: Render DPI
+    """
+    page_width_in = page_width_pt / 72
+    dpi = math.ceil(target_pixel_width(display_width_in, effective_dpi) / page_width_in)
+    return max(MIN_RENDER_DPI, min(MAX_RENDER_DPI, dpi))
+
+
+def is_line_art(image, sample_size=256):
+    """
+    Decide whether an image is line art (schematics, screenshots, text pages).
+
+    Samples the image with nearest-neighbour so no blended colours are invented,
+    then checks how much of it a few colours cover.
+
+    Args:
+        image (Image.Image): Image to classify
+
+    Returns:
+        bool: True for line art, False for photographic content
+    """
+    scale = min(1.0, sample_size / max(image.size))
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    sample = image.resize(size, Image.NEAREST).convert("RGB")
+    pixel_count = sample.width * sample.height
+    counts = sorted(sample.getcolors(maxcolors=pixel_count), reverse=True)
+    top = sum(count for count, _ in counts[:LINE_ART_COLORS])
+    return top >= LINE_ART_COVERAGE * pixel_count
+
+
+def encode_for_docx(image, target_width=None):
+    """
+    Downscale an image to the width it is shown at and pick its encoding.
+
+    Line art is stored as a palette PNG, photographic content as JPEG.
+
+    Args:
+        image (Image.Image): Decoded image
+        target_width (int): Pixel width to scale down to (see target_pixel_width)
+
+    Returns:
+        bytes: Encoded image
+    """
+    target_width = target_width or target_pixel_width()
+    if image.width > target_width:
+        height = max(1, round(image.height * target_width / image.width))
+        # reducing_gap box-reduces first, then applies LANCZOS to the last step
+        image = image.resize((target_width, height), Image.LANCZOS, reducing_gap=3.0)
+
+    buffer = io.BytesIO()
+    if is_line_art(image):
+        image.convert("RGB").quantize(colors=256, method=Image.Quantize.FASTOCTREE).save(buffer, "PNG", optimize=True)
+    else:
+        image.convert("RGB").save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def fit_image_for_docx(source, target_width=None):
+    """
+    Prepare an image for add_picture.
+
+    Images that are already no wider than needed are passed through untouched
+    (only their header is read); larger ones are downscaled and re-encoded.
+
+    Args:
+        source (str | bytes): Image path or encoded bytes
+        target_width (int): Pixel width the image is shown at
+
+    Returns:
+        str | BytesIO: Something add_picture accepts
+    """
+    target_width = target_width or target_pixel_width()
+    stream = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    with Image.open(stream) as image:
+        if image.width <= target_width:
+            if isinstance(stream, io.BytesIO):
+                stream.seek(0)
+            return stream
+        return io.BytesIO(encode_for_docx(image, target_width))
+
+
+def image_nbytes(source):
+    """
+    Get the encoded size of an image handed to add_picture.
+
+    Args:
+        source (str | bytes | BytesIO): Image path, bytes or stream
+
+    Returns:
+        int: Size in bytes
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    if isinstance(source, io.BytesIO):
+        return source.getbuffer().nbytes
+    return os.path.getsize(source)
+
+
+def prepare_photo(source, target_width=None):
+    """
+    Decode a camera photo at a reduced scale and fit it to the manual.
+
+    JPEGs are decoded in draft mode, which lets libjpeg skip straight to 1/2,
+    1/4 or 1/8 scale, so a 48 MP photo is never decoded at full size. EXIF
+    orientation is applied before re-encoding, since it is not kept on the
+    re-encoded image.
+
+    Args:
+        source (str | bytes): Path to the photo, or the uploaded bytes
+        target_width (int): Pixel width the photo is shown at
+
+    Returns:
+        str | BytesIO: The original photo when it needs no changes,
+        otherwise the re-encoded image
+    """
+    target_width = target_width or target_pixel_width()
+    in_memory = isinstance(source, (bytes, bytearray, memoryview))
+    with Image.open(io.BytesIO(source) if in_memory else source) as image:
+        orientation = image.getexif().get(0x0112, 1)
+        width, height = image.size
+        shown_width = height if orientation in _TRANSPOSED_ORIENTATIONS else width
+        if shown_width <= target_width and orientation == 1:
+            return io.BytesIO(source) if in_memory else source
+
+        if image.format == "JPEG" and shown_width > target_width:
+            scale = target_width / shown_width
+            image.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+
+        return io.BytesIO(encode_for_docx(ImageOps.exif_transpose(image), target_width))
+
+
+def _prepare_or_keep(source, target_width):
+    try:
+        return prepare_photo(source, target_width)
+    except Exception as e:
+        name = source if isinstance(source, str) else "uploaded image"
+        print(f"Error preparing image {name}: {str(e)}")
+        return io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+
+
+def prepare_photos(paths, target_width=None, workers=None):
+    """
+    Prepare a batch of photos for the manual on a thread pool.
+
+    Pillow releases the GIL while decoding, resizing and encoding, so the
+    photos are processed in parallel. A photo that cannot be prepared is
+    passed on unchanged.
+
+    Args:
+        paths (list): Photo paths or uploaded bytes
+        target_width (int): Pixel width the photos are shown at
+        workers (int): Worker threads (PHOTO_PREP_WORKERS)
+
+    Returns:
+        list: Paths or BytesIO streams for add_picture, in input order
+    """
+    if not paths:
+        return []
+    workers = min(workers or PHOTO_PREP_WORKERS, len(paths))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda path: _prepare_or_keep(path, target_width), paths))
@@ -0,0 +1,209 @@
+import os
+import shutil
+import tempfile
+import uuid
+
+from dedup_index import DedupIndex
+from progress import Progress
+
+DEFAULT_TEMPLATE_PATH = "template/base_file.docx"
+
+# Parent directory of the per-job workspaces (system temp directory when unset)
+JOB_ROOT = os.environ.get("MANUAL_JOB_ROOT") or None
+
+# Uploads are kept in memory until a job holds this much; larger ones go to its workspace
+INPUT_MEMORY_MAX_BYTES = int(os.environ.get("MANUAL_INPUT_MEMORY_MB", 64)) * 1024 * 1024
+
+# Input folders a job can hold, named like the original shared uploads/ folders
+UPLOAD_CATEGORIES = [
+    "DAP", "HMI", "Machine_Photos", "Layout_Photos", "SOP", "SCADA", "Alarms",
+    "MBOM", "EBOM", "Pneumatic", "Laser_Doc", "E-PLAN_Drawing", "Project_info",
+]
+
+
+class Job:
+    """
+    One manual generation: its workspace, its inputs and its intermediate results.
+
+    Every job gets its own temporary directory tree, so several jobs can run in
+    one process at the same time without sharing any folder or module state.
+    Uploads added with add_input stay in memory up to INPUT_MEMORY_MAX_BYTES,
+    so small and medium jobs never write their inputs to disk.
+
+        <root>/uploads/<category>/   input files (unless uploads_dir is given)
+        <root>/work/<name>/          intermediate files of a stage
+        <root>/output/               the generated manual
+    """
+
+    def __init__(self, uploads_dir=None, template_path=DEFAULT_TEMPLATE_PATH, job_id=None, root_dir=None, root=None, progress=None):
+        """
+        Args:
+            uploads_dir (str): Read inputs from this existing folder tree instead
+                of the job's own (e.g. the shared uploads/ folder of the CLI)
+            template_path (str): Path to the .docx template
+            job_id (str): Identifier of the job (random when None)
+            root_dir (str): Where to create the workspace (MANUAL_JOB_ROOT)
+            root (str): Reopen an existing workspace, e.g. in a queue worker
+            progress (Progress): Receives the job's progress events
+        """
+        self.id = job_id or uuid.uuid4().hex
+        if root:
+            os.makedirs(root, exist_ok=True)
+            self.root = root
+        else:
+            root_dir = root_dir or JOB_ROOT
+            if root_dir:
+                os.makedirs(root_dir, exist_ok=True)
+            self.root = tempfile.mkdtemp(prefix=f"manual_job_{self.id[:8]}_", dir=root_dir)
+        self.owns_uploads = uploads_dir is None
+        self.uploads_dir = uploads_dir or os.path.join(self.root, "uploads")
+        self.output_dir = os.path.join(self.root, "output")
+        self.template_path = template_path
+
+        # Upload category -> {file name: contents} of the uploads kept in memory
+        self.memory_inputs = {}
+        self.memory_input_bytes = 0
+        # Uploads that did not fit in memory and were written to the input folders
+        self.disk_input_bytes = 0
+
+        # Upload category -> result of its extraction stage (prepared photos,
+        # slide headings and images, PDF path), read back when it is inserted
+        self.extracted = {}
+
+        # Rendered slides and pages of every section, so duplicates reuse their OCR and image
+        self.dedup = DedupIndex()
+
+        # Stages report their items and bytes written here
+        self.progress = progress or Progress()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+    def input_dir(self, category):
+        """
+        Get the folder holding the job's inputs of one category.
+
+        Args:
+            category (str): Upload category, e.g. "DAP" or "Machine_Photos"
+
+        Returns:
+            str: Folder path (created for the job's own uploads)
+        """
+        path = os.path.join(self.uploads_dir, category)
+        if self.owns_uploads:
+            os.makedirs(path, exist_ok=True)
+        return path
+
+    def add_input(self, category, filename, data):
+        """
+        Store an uploaded file in the job.
+
+        The file is kept in memory while the job's in-memory uploads stay under
+        INPUT_MEMORY_MAX_BYTES, and written to the job's input folder otherwise.
+
+        Args:
+            category (str): Upload category
+            filename (str): File name to store it under
+            data (bytes | memoryview): File contents, e.g. UploadedFile.getbuffer()
+
+        Returns:
+            str | bytes: Path to the stored file, or the contents kept in memory
+        """
+        filename = os.path.basename(filename)
+        if self.memory_input_bytes + len(data) <= INPUT_MEMORY_MAX_BYTES:
+            data = bytes(data)
+            self.memory_inputs.setdefault(category, {})[filename] = data
+            self.memory_input_bytes += len(data)
+            return data
+
+        path = os.path.join(self.input_dir(category), filename)
+        with open(path, "wb") as f:
+            f.write(data)
+        self.disk_input_bytes += len(data)
+        return path
+
+    def input_files(self, category, extensions):
+        """
+        List the job's inputs of one category, wherever they are kept.
+
+        Args:
+            category (str): Upload category
+            extensions (tuple): Lower-case file extensions to include, e.g. (".pdf",)
+
+        Returns:
+            list: Paths (inputs on disk) and bytes (inputs in memory), ordered by file name
+        """
+        files = {}
+        folder = os.path.join(self.uploads_dir, category)
+        if os.path.isdir(folder):
+            for filename in os.listdir(folder):
+                if filename.lower().endswith(extensions):
+                    files[filename] = os.path.join(folder, filename)
+        for filename, data in self.memory_inputs.get(category, {}).items():
+            if filename.lower().endswith(extensions):
+                files[filename] = data
+        return [files[filename] for filename in sorted(files)]
+
+    def persist_inputs(self):
+        """
+        Write the uploads kept in memory to the job's input folders, for a job
+        that is generated in another process (see job_queue.submit_job).
+        """
+        for category, files in self.memory_inputs.items():
+            for filename, data in files.items():
+                with open(os.path.join(self.input_dir(category), filename), "wb") as f:
+                    f.write(data)
+        self.memory_inputs = {}
+        self.memory_input_bytes = 0
+
+    def work_dir(self, name, create=True):
+        """
+        Get a scratch folder for one stage of the job.
+
+        Args:
+            name (str): Stage name, e.g. "dap_img_extracted"
+            create (bool): Create the folder; stages that only write to it
+                occasionally create it themselves
+
+        Returns:
+            str: Folder path
+        """
+        path = os.path.join(self.root, "work", name)
+        if create:
+            os.makedirs(path, exist_ok=True)
+        return path
+
+    @property
+    def project_info_path(self):
+        """Path to the job's Project_info.txt."""
+        return os.path.join(self.uploads_dir, "Project_info", "Project_info.txt")
+
+    @property
+    def project_info_source(self):
+        """The job's Project_info.txt: its contents when kept in memory, otherwise its path."""
+        return self.memory_inputs.get("Project_info", {}).get("Project_info.txt", self.project_info_path)
+
+    def write_project_info(self, info):
+        """
+        Store the form fields as Project_info.txt in the key = value format
+        extract_project_info reads.
+
+        Args:
+            info (dict): Field name -> value
+
+        Returns:
+            str | bytes: Path to the written file, or its contents when kept in memory
+        """
+        lines = []
+        for key, value in info.items():
+            # One field per line; extract_project_info reads line by line
+            value = " ".join(str(value or "").split())
+            lines.append(f"{key} = {value},\n")
+        return self.add_input("Project_info", "Project_info.txt", "".join(lines).encode("utf-8"))
+
+    def cleanup(self):
+        """Delete the job's workspace, including its own uploads and output."""
+        shutil.rmtree(self.root, ignore_errors=True)
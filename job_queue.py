@@ -0,0 +1,464 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+from job import Job
+from progress import print_progress
+
+QUEUE_DB_PATH = os.environ.get("MANUAL_QUEUE_DB", os.path.join(".cache", "job_queue.sqlite3"))
+
+# Worker processes consuming the queue (0 disables the pool the app starts itself)
+QUEUE_WORKERS = int(os.environ.get("MANUAL_QUEUE_WORKERS", 2))
+
+# Seconds an idle worker waits before looking for new jobs
+QUEUE_POLL_INTERVAL = float(os.environ.get("MANUAL_QUEUE_POLL_S", 1.0))
+
+# Minimum seconds between progress writes of a running job
+PROGRESS_WRITE_INTERVAL = 0.5
+
+# A worker exits and is replaced after this many jobs (0 = never) or once its
+# resident memory exceeds this many MB (0 = no limit), so leaks cannot build up
+WORKER_MAX_JOBS = int(os.environ.get("MANUAL_WORKER_MAX_JOBS", 50))
+WORKER_MAX_RSS_MB = int(os.environ.get("MANUAL_WORKER_MAX_RSS_MB", 2048))
+
+# Seconds between checks of the pool supervisor for exited workers
+WORKER_SUPERVISE_INTERVAL = 1.0
+
+# Jobs whose uploads are all kept in memory and add up to at most this many MB
+# are generated in the submitting process, without the queue or any file
+# written (0 = queue every job), at most MANUAL_INPROCESS_JOBS at a time
+INPROCESS_MAX_BYTES = int(os.environ.get("MANUAL_INPROCESS_MB", 16)) * 1024 * 1024
+INPROCESS_JOBS = int(os.environ.get("MANUAL_INPROCESS_JOBS", 1))
+
+# Finished jobs (and their workspaces) are kept this long for the UI to fetch the result
+JOB_RETENTION_S = int(os.environ.get("MANUAL_JOB_RETENTION_S", 3600))
+
+# A running job without a progress event for this many seconds is failed, in
+# case its worker died somewhere no supervisor saw it (0 = never)
+JOB_STALE_S = int(os.environ.get("MANUAL_JOB_STALE_S", 1800))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    root TEXT NOT NULL,
+    template_path TEXT NOT NULL,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    worker_pid INTEGER,
+    output_file TEXT,
+    error TEXT,
+    progress TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_submitted ON jobs (status, submitted_at);
+"""
+
+_worker_pool = None
+_inprocess_slots = threading.BoundedSemaphore(max(INPROCESS_JOBS, 1))
+
+
+@contextlib.contextmanager
+def _connect(db_path=None):
+    db_path = db_path or QUEUE_DB_PATH
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    # Autocommit; transactions are opened explicitly where a read and a write must be atomic
+    connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+        # Queues created before progress reporting or stale job detection lack the columns
+        columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in (("progress", "TEXT"), ("updated_at", "REAL")):
+            if column not in columns:
+                connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        yield connection
+    finally:
+        connection.close()
+
+
+def submit_job(job, db_path=None):
+    """
+    Queue a job for a worker process.
+
+    Uploads the job kept in memory are written to its workspace first, since
+    the worker that picks the job up runs in another process.
+
+    Args:
+        job (Job): The job to generate
+        db_path (str): Queue database (MANUAL_QUEUE_DB)
+
+    Returns:
+        str: Job id
+    """
+    job.persist_inputs()
+    with _connect(db_path) as db:
+        db.execute(
+            "INSERT INTO jobs (id, status, root, template_path, submitted_at) VALUES (?, ?, ?, ?, ?)",
+            (job.id, QUEUED, job.root, job.template_path, time.time()),
+        )
+    return job.id
+
+
+def generate_in_process(job, progress_callback=None):
+    """
+    Generate a small job right here instead of queueing it.
+
+    Its uploads stay in memory and the manual is returned as a buffer, so
+    nothing is written to disk. Larger jobs, jobs with uploads on disk and
+    jobs arriving while MANUAL_INPROCESS_JOBS others run are left for the queue.
+
+    Args:
+        job (Job): The job to generate
+        progress_callback (callable): Receives the job's progress events
+
+    Returns:
+        SpooledTemporaryFile: The manual (see generate_manual), or None when
+            the job should be submitted to the queue instead
+    """
+    if not INPROCESS_MAX_BYTES or INPROCESS_JOBS <= 0:
+        return None
+    if not job.owns_uploads or job.disk_input_bytes or job.memory_input_bytes > INPROCESS_MAX_BYTES:
+        return None
+    if not _inprocess_slots.acquire(blocking=False):
+        return None
+    try:
+        from manual_generator import generate_manual
+
+        return generate_manual(None, job=job, progress_callback=progress_callback)
+    finally:
+        _inprocess_slots.release()
+
+
+def get_job_status(job_id, db_path=None):
+    """
+    Get the state of a queued job.
+
+    Args:
+        job_id (str): Job id from submit_job
+        db_path (str): Queue database
+
+    Returns:
+        dict: Row of the job plus its "position" in the queue (0 once it runs),
+            "wait_s", "run_s" and its latest "progress" event (None before the
+            first one), or None for an unknown job
+    """
+    now = time.time()
+    with _connect(db_path) as db:
+        row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        status = dict(row)
+        status["progress"] = json.loads(row["progress"]) if row["progress"] else None
+        status["position"] = 0
+        if row["status"] == QUEUED:
+            status["position"] = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND submitted_at <= ?", (QUEUED, row["submitted_at"])
+            ).fetchone()[0]
+
+    status["wait_s"] = (row["started_at"] or now) - row["submitted_at"]
+    status["run_s"] = ((row["finished_at"] or now) - row["started_at"]) if row["started_at"] else 0.0
+    return status
+
+
+def get_queue_stats(window_s=3600, db_path=None):
+    """
+    Summarize the queue for the UI and for scaling decisions.
+
+    Args:
+        window_s (int): Average wait and run times over jobs finished this recently
+        db_path (str): Queue database
+
+    Returns:
+        dict: "queued", "running", "avg_wait_s", "avg_run_s" and the
+            "oldest_wait_s" of the jobs still queued
+    """
+    now = time.time()
+    with _connect(db_path) as db:
+        counts = dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        oldest = db.execute("SELECT MIN(submitted_at) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+        averages = db.execute(
+            "SELECT AVG(started_at - submitted_at), AVG(finished_at - started_at) FROM jobs "
+            "WHERE status IN (?, ?) AND finished_at >= ?",
+            (DONE, FAILED, now - window_s),
+        ).fetchone()
+
+    return {
+        "queued": counts.get(QUEUED, 0),
+        "running": counts.get(RUNNING, 0),
+        "oldest_wait_s": now - oldest if oldest else 0.0,
+        "avg_wait_s": averages[0] or 0.0,
+        "avg_run_s": averages[1] or 0.0,
+    }
+
+
+def claim_next_job(db_path=None, stale_s=None):
+    """
+    Atomically take the oldest queued job and mark it running.
+
+    Running jobs that have not reported progress for stale_s seconds are
+    failed first, so a job whose worker died unnoticed does not run forever.
+
+    Args:
+        db_path (str): Queue database
+        stale_s (int): Seconds without progress after which a running job
+            is failed (MANUAL_JOB_STALE_S, 0 = never)
+
+    Returns:
+        sqlite3.Row: The claimed job, or None when the queue is empty
+    """
+    stale_s = JOB_STALE_S if stale_s is None else stale_s
+    now = time.time()
+    with _connect(db_path) as db:
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if stale_s:
+                db.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ?, error = ? "
+                    "WHERE status = ? AND COALESCE(updated_at, started_at) < ?",
+                    (FAILED, now, f"No progress for {stale_s}s; its worker stopped", RUNNING, now - stale_s),
+                )
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY submitted_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE jobs SET status = ?, started_at = ?, updated_at = ?, worker_pid = ? WHERE id = ?",
+                    (RUNNING, now, now, os.getpid(), row["id"]),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+    return row
+
+
+def _progress_writer(job_id, db_path=None):
+    """Progress callback that stores the latest event of a job, at most every PROGRESS_WRITE_INTERVAL."""
+    last_write = [0.0]
+
+    def write(event):
+        print_progress(event)
+        now = time.monotonic()
+        if not event["finished"] and now - last_write[0] < PROGRESS_WRITE_INTERVAL:
+            return
+        last_write[0] = now
+        with _connect(db_path) as db:
+            db.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?", (json.dumps(event), time.time(), job_id))
+
+    return write
+
+
+def _finish_job(job_id, status, output_file=None, error=None, db_path=None):
+    with _connect(db_path) as db:
+        db.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, output_file = ?, error = ? WHERE id = ?",
+            (status, time.time(), output_file, error, job_id),
+        )
+
+
+def fail_worker_jobs(worker_pid, error, db_path=None):
+    """
+    Fail the jobs a worker process was running when it exited.
+
+    Args:
+        worker_pid (int): Process id of the worker
+        error (str): Error shown for each of its jobs
+        db_path (str): Queue database
+
+    Returns:
+        int: Number of jobs failed
+    """
+    with _connect(db_path) as db:
+        return db.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE status = ? AND worker_pid = ?",
+            (FAILED, time.time(), error, RUNNING, worker_pid),
+        ).rowcount
+
+
+def purge_finished_jobs(max_age_s=None, db_path=None):
+    """
+    Delete finished jobs older than max_age_s along with their workspaces.
+
+    Returns:
+        int: Number of jobs purged
+    """
+    max_age_s = JOB_RETENTION_S if max_age_s is None else max_age_s
+    with _connect(db_path) as db:
+        rows = db.execute(
+            "SELECT id, root FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (DONE, FAILED, time.time() - max_age_s),
+        ).fetchall()
+        for row in rows:
+            Job(job_id=row["id"], root=row["root"]).cleanup()
+            db.execute("DELETE FROM jobs WHERE id = ?", (row["id"],))
+    return len(rows)
+
+
+def run_job(row, db_path=None):
+    """
+    Generate the manual of a claimed job and record the outcome.
+
+    Returns:
+        bool: Whether the manual was generated
+    """
+    # Imported here so the queue can be used without loading the whole pipeline
+    from manual_generator import generate_manual
+
+    job = Job(job_id=row["id"], root=row["root"], template_path=row["template_path"])
+    try:
+        output_file = generate_manual(job.output_dir, job=job, progress_callback=_progress_writer(job.id, db_path))
+    except Exception as e:
+        traceback.print_exc()
+        _finish_job(job.id, FAILED, error=str(e), db_path=db_path)
+        return False
+    _finish_job(job.id, DONE, output_file=output_file, db_path=db_path)
+    return True
+
+
+def current_rss_mb():
+    """
+    Get the resident memory of this process.
+
+    Returns:
+        float: Megabytes, or None where it cannot be read
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # Peak rather than current usage; ru_maxrss is in KB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def worker_loop(db_path=None, poll_interval=None, max_jobs=None, max_rss_mb=None, warm=True):
+    """
+    Consume queued jobs until the worker should be recycled.
+
+    The worker loads its backends and the template once (manual_generator.warm_up)
+    and then keeps them for every job it runs.
+
+    Args:
+        db_path (str): Queue database
+        poll_interval (float): Seconds to wait when the queue is empty (MANUAL_QUEUE_POLL_S)
+        max_jobs (int): Stop after this many jobs (MANUAL_WORKER_MAX_JOBS, 0 = never)
+        max_rss_mb (int): Stop after a job that leaves the worker above this
+            resident memory (MANUAL_WORKER_MAX_RSS_MB, 0 = no limit)
+        warm (bool): Preload backends and the default template before the first job
+
+    Returns:
+        int: Number of jobs processed
+    """
+    poll_interval = poll_interval or QUEUE_POLL_INTERVAL
+    max_jobs = WORKER_MAX_JOBS if max_jobs is None else max_jobs
+    max_rss_mb = WORKER_MAX_RSS_MB if max_rss_mb is None else max_rss_mb
+    if warm:
+        from manual_generator import warm_up
+        warm_up()
+
+    processed = 0
+    while not max_jobs or processed < max_jobs:
+        row = claim_next_job(db_path)
+        if row is None:
+            purge_finished_jobs(db_path=db_path)
+            time.sleep(poll_interval)
+            continue
+        print(f"🧾 Worker {os.getpid()} running job {row['id']}")
+        run_job(row, db_path)
+        processed += 1
+
+        rss_mb = current_rss_mb()
+        if max_rss_mb and rss_mb is not None and rss_mb > max_rss_mb:
+            print(f"♻️ Worker {os.getpid()} uses {rss_mb:.0f} MB after {processed} job(s); recycling")
+            break
+    return processed
+
+
+def _start_worker(db_path, number):
+    process = multiprocessing.Process(target=worker_loop, args=(db_path,), name=f"manual-worker-{number}")
+    process.start()
+    return process
+
+
+def run_workers(workers=None, db_path=None):
+    """
+    Run a pool of queue worker processes in the foreground.
+
+    Workers that exit, after MANUAL_WORKER_MAX_JOBS jobs, above
+    MANUAL_WORKER_MAX_RSS_MB or by crashing, are replaced with fresh ones.
+    A job the worker was still running (it crashed or was killed) is failed.
+
+    Args:
+        workers (int): Worker processes (MANUAL_QUEUE_WORKERS)
+        db_path (str): Queue database
+    """
+    workers = workers or QUEUE_WORKERS or 1
+    processes = [_start_worker(db_path, i + 1) for i in range(workers)]
+    print(f"👷 {workers} queue worker(s) started")
+    started = workers
+    while True:
+        time.sleep(WORKER_SUPERVISE_INTERVAL)
+        for i, process in enumerate(processes):
+            if not process.is_alive():
+                process.join()
+                lost = fail_worker_jobs(
+                    process.pid, f"Worker exited (code {process.exitcode}) while generating the manual", db_path)
+                started += 1
+                processes[i] = _start_worker(db_path, started)
+                print(f"👷 Worker {process.pid} exited (code {process.exitcode}); started a replacement")
+                if lost:
+                    print(f"⚠️ Failed {lost} job(s) worker {process.pid} was running")
+
+
+def start_worker_pool(workers=None, db_path=None):
+    """
+    Start the worker pool as a separate process, once per process.
+
+    Workers run outside the caller so a long job never blocks it, and more
+    worker nodes can be added by running `python job_queue.py` on them against
+    the same MANUAL_QUEUE_DB and MANUAL_JOB_ROOT.
+
+    Returns:
+        subprocess.Popen: The pool process, or None when MANUAL_QUEUE_WORKERS is 0
+    """
+    global _worker_pool
+    workers = QUEUE_WORKERS if workers is None else workers
+    if workers <= 0:
+        return None
+    if _worker_pool is None or _worker_pool.poll() is not None:
+        command = [sys.executable, os.path.abspath(__file__), "--workers", str(workers)]
+        if db_path:
+            command += ["--db", db_path]
+        _worker_pool = subprocess.Popen(command)
+    return _worker_pool
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run manual generation queue workers.")
+    parser.add_argument("--workers", type=int, default=QUEUE_WORKERS or 1, help="Worker processes")
+    parser.add_argument("--db", default=None, help="Queue database (MANUAL_QUEUE_DB)")
+    args = parser.parse_args()
+    run_workers(args.workers, args.db)
@@ -1,31 +1,20 @@
+import io
 import os
 import tempfile
 import shutil
+import time
 from docx import Document
 from datetime import datetime
 
 
-from pptx_data_processing import (
-    process_dap_to_docx,
-    process_sop_to_docx,
-    process_hmi_to_docx,
-    process_scada_to_docx,
-)
+from dedup_index import format_dedup_report
+from Img_expraction import remove_unused_placeholders
 
-from Img_expraction import (
-    process_machine_photos,
-    process_layout_photos,
-    remove_unused_placeholders,
-    get_images_from_folder,
-    process_pneumatic_photos
-)
-
-from pdf_doc_extractor import (
-    pdf_to_images,
-    insert_pdf_images_at_placeholder,
-    process_eplan_pdf_to_docx,
-    process_alarms_pdf_to_docx
-)
+from job import DEFAULT_TEMPLATE_PATH, Job
+from pipeline import Stage, run_stages
+from progress import print_progress
+from sections import SECTIONS
+from template_cache import open_template, preload_template
 
 from project_details import (
     extract_project_info,
@@ -34,7 +23,10 @@ from project_details import (
     insert_electrical_specifications
 )
 
-# Define upload directories to clean after processing
+# Manuals returned in memory (output_dir=None) spill to a temporary file beyond this size
+OUTPUT_SPOOL_MAX_BYTES = int(os.environ.get("MANUAL_OUTPUT_SPOOL_MB", 64)) * 1024 * 1024
+
+# Shared upload directories cleaned after a manual is generated from them (see generate_manual)
 UPLOAD_DIRS = [
     "uploads/DAP", 
     "uploads/HMI", 
@@ -77,108 +69,264 @@ def clean_upload_directories():
                     print(f"Error cleaning up file {file_path}: {e}")
 
 
-def generate_manual(output_dir):
+def get_extraction_stages():
+    """
+    List the stages that prepare section content before it is inserted.
+
+    Photo preparation, slide extraction and PDF page rendering of different
+    sections do not depend on each other or on the document, so they run
+    concurrently. Each stage keeps its result on job.extracted, where the
+    section's insertion picks it up.
+
+    Returns:
+        list: pipeline.Stage objects, one per registered section
+    """
+    return [
+        Stage(
+            section.extraction_name,
+            section.extract,
+            outputs=(f"extracted:{section.category}",),
+            unit=section.unit,
+        )
+        for section in SECTIONS
+    ]
+
+
+def get_manual_stages():
+    """
+    List the manual generation stages in the order they are applied.
+
+    Every stage takes the Job being generated, the working document and the
+    StageProgress of the assembly. The document is either the path of the
+    working .docx file (each stage opens and saves it) or a shared Document
+    object (nothing is serialized until the pipeline finishes). Upload
+    sections come from the registry in sections.py and read their content
+    from the job (see get_extraction_stages); scratch files go to the job's
+    workspace only.
+
+    Returns:
+        list: (status message, stage callable) tuples
+    """
+    stages = [("Adding project details...", lambda job, docx, progress: insert_project_info(docx, job))]
+    for section in SECTIONS:
+        for _ in range(section.inserts):
+            stages.append((section.message, lambda job, docx, progress, section=section: section.insert(job, docx, progress)))
+    return stages + [
+        ("Adding Machine Specifications...", lambda job, docx, progress: insert_machine_specifications(docx, job)),
+        ("Adding electrical specifications...", lambda job, docx, progress: insert_electrical_specifications(docx, job)),
+        ("Removing unused placeholders...", lambda job, docx, progress: remove_unused_placeholders(docx)),
+    ]
+
+
+def estimate_io_savings(template_path, output_file, stage_count, template_parse_s, output_save_s):
+    """
+    Estimate the parse and zip time the single in-memory pass saved.
+
+    The per-stage path opens and saves the working document once per stage. Its
+    size grows from the template to the finished manual, so the per-stage cost is
+    taken as the mean of the template and the finished manual costs.
+
+    Args:
+        template_path (str): Path to the template the pipeline started from
+        output_file (str | file): Path to the finished manual, or the buffer it was saved to
+        stage_count (int): Number of stages that would each have opened and saved
+        template_parse_s (float): Measured time to open the template (a copy of it once cached)
+        output_save_s (float): Measured save time of the finished manual
+
+    Returns:
+        dict: Measured and estimated timings in seconds
+    """
+    template = Document(template_path)
+    start = time.perf_counter()
+    template.save(io.BytesIO())
+    template_save_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Document(output_file)
+    output_parse_s = time.perf_counter() - start
+
+    per_stage_s = (template_parse_s + output_parse_s) / 2 + (template_save_s + output_save_s) / 2
+    return {
+        "stages": stage_count,
+        "pipeline_io_s": template_parse_s + output_save_s,
+        "per_stage_io_s": stage_count * per_stage_s,
+        "saved_s": (stage_count - 1) * per_stage_s,
+    }
+
+
+def warm_up(template_path=DEFAULT_TEMPLATE_PATH):
+    """
+    Load everything a generation needs up front, for long-lived workers.
+
+    Imports the document, slide and PDF backends, configures tesseract, loads
+    the heading font and parses the template, so none of it is paid for by the
+    first job (see job_queue.worker_loop).
+
+    Args:
+        template_path (str): Template to keep parsed in memory
     """
-    Generate a manual by processing all files in the uploads directory.
+    import fitz  # PyMuPDF
+    import pptx
+
+    from ocr_service import load_tesseract
+    from pptx_data_processing import get_heading_font
+
+    load_tesseract()
+    get_heading_font()
+    if os.path.exists(template_path):
+        preload_template(template_path)
+
+
+def generate_manual(output_dir, in_memory=True, report_io_savings=False, job=None, progress_callback=None):
+    """
+    Generate a manual from the files uploaded to a job.
     
     Args:
-        project_info (dict): Dictionary containing project information
-        electrical_specs (dict): Dictionary containing electrical specifications
-        output_dir (str): Directory to save the output file
+        output_dir (str): Directory to save the output file. When None, the
+            manual is not written to disk but returned as a buffer (spooled to a
+            temporary file beyond MANUAL_OUTPUT_SPOOL_MB), e.g. to stream it
+            straight to a download.
+        in_memory (bool): Run every stage on one shared Document and save it once.
+            When False, each stage opens and saves a working copy of the template
+            in the job's workspace.
+        report_io_savings (bool): Print how much parse and zip time the in-memory
+            pass saved compared with opening and saving per stage
+        job (Job): Job to generate. When None, a job reading the shared uploads/
+            folders is used, and those folders are emptied afterwards.
+        progress_callback (callable): Receives a progress event dict (see
+            progress.Progress) whenever a stage starts, advances or finishes.
+            Defaults to printing each finished stage with its throughput.
     
     Returns:
-        str: Path to the generated manual file
+        str | SpooledTemporaryFile: Path to the generated manual file, or the
+            buffer holding it (positioned at the start) when output_dir is None
     """
+    shared_uploads = job is None
+    if shared_uploads:
+        job = Job(uploads_dir="uploads")
+
     # Create the output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
     
     # Load the base file
-    source_file_path = "template/base_file.docx"    
-    base_file_path = "uploads/Template/base_file.docx"
-    if not os.path.exists(base_file_path):
-        raise FileNotFoundError(f"Base file not found: {base_file_path}")
-    
-    shutil.copyfile(source_file_path, base_file_path)
+    source_file_path = job.template_path
+    base_file_path = os.path.join(job.work_dir("Template", create=not in_memory), "base_file.docx")
+    if not os.path.exists(source_file_path):
+        raise FileNotFoundError(f"Base file not found: {source_file_path}")
 
-    doc = Document(base_file_path)
-    
-    try:
-        # Process each type of file
-        print("Processing machine photos...")
-        process_machine_photos(base_file_path) 
-        process_machine_photos(base_file_path) 
-        
-        print("Adding project details...")
-        insert_project_info(base_file_path)
-        
-        print("Processing layout photos...")
-        process_layout_photos(base_file_path)
+    sections = get_manual_stages()
+    extraction_stages = get_extraction_stages()
+    generation_start = time.perf_counter()
 
-        print("Processing DAP file...")
-        process_dap_to_docx(
-            folder_path="uploads/DAP",
-            template_path= base_file_path,
-        )
-        
-        print("Processing SOP file...")
-        process_sop_to_docx(
-            folder_path="uploads/SOP",
-            template_path=base_file_path,
-        )
+    # Handed from the assembly stage to the save stage
+    timings = {}
+    document = {}
 
-        print("Processing HMI file...")
-        process_hmi_to_docx(
-            folder_path="uploads/HMI",
-            template_path=base_file_path,
-        )
+    def assemble(job, progress):
+        if in_memory:
+            # A copy of the parsed template; a warm worker parses it only once
+            start = time.perf_counter()
+            docx = open_template(source_file_path)
+            timings["parse_s"] = time.perf_counter() - start
+        else:
+            shutil.copyfile(source_file_path, base_file_path)
+            docx = base_file_path
 
-        print("Processing SCADA file...")
-        process_scada_to_docx(
-            folder_path="uploads/SCADA",
-            template_path=base_file_path,
-        )
-
-        print("Processing alarms file...")
-        process_alarms_pdf_to_docx(
-            folder_path="uploads/Alarms",
-            template_path=base_file_path,
-        )
+        # Insert every section in document order; their content is already extracted
+        progress.update(total=len(sections), unit="sections")
+        for message, section in sections:
+            print(message)
+            section(job, docx, progress)
+            progress.update(advance=1)
+        document["docx"] = docx
 
-        print("Processing electrical circuit diagram...")
-        process_eplan_pdf_to_docx(
-            folder_path="uploads/E-PLAN_Drawing",
-            template_path=base_file_path,
-        )
+    def save(job, progress):
+        docx = document["docx"]
+        progress.update(total=1, unit="files")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        info = {"project_name": ""}
+        project_info = extract_project_info(txt_path=job.project_info_source, info=info)
+        if output_dir is None:
+            output_file = tempfile.SpooledTemporaryFile(max_size=OUTPUT_SPOOL_MAX_BYTES)
+        else:
+            output_file = os.path.join(output_dir, f"{project_info['project_name']}_{timestamp}.docx")
+        if in_memory:
+            # Pictures in the body against the image parts they share
+            timings["media"] = (len(docx.element.body.xpath(".//a:blip")), len(docx.part.package.image_parts))
+            start = time.perf_counter()
+            docx.save(output_file)
+            save_s = time.perf_counter() - start
 
-        print("Processing pneumatic circuit diagram...")
-        process_pneumatic_photos(doc, base_file_path)
+            if report_io_savings:
+                savings = estimate_io_savings(source_file_path, output_file, len(sections), timings["parse_s"], save_s)
+                print(
+                    f"⏱️ Document I/O: {savings['pipeline_io_s']:.2f}s for one pass vs "
+                    f"~{savings['per_stage_io_s']:.2f}s for {savings['stages']} open/save cycles "
+                    f"(saved ~{savings['saved_s']:.2f}s)"
+                )
+        elif output_dir is None:
+            with open(base_file_path, "rb") as f:
+                shutil.copyfileobj(f, output_file)
+        else:
+            shutil.copyfile(base_file_path, output_file)
 
-        print("Adding Machine Specifications...")
-        insert_machine_specifications(base_file_path)
+        if output_dir is None:
+            timings["size"] = output_file.seek(0, os.SEEK_END)
+            output_file.seek(0)
+        else:
+            timings["size"] = os.path.getsize(output_file)
+        progress.update(advance=1, bytes_written=timings["size"])
+        return output_file
 
-        print("Adding electrical specifications...")
-        insert_electrical_specifications(base_file_path)
+    stages = extraction_stages + [
+        Stage(
+            "Assembling manual...",
+            assemble,
+            inputs=[output for stage in extraction_stages for output in stage.outputs],
+            outputs=("document",),
+            unit="sections",
+        ),
+        Stage(
+            "Saving manual...",
+            save,
+            inputs=("document",),
+            outputs=("manual",),
+            unit="files",
+        ),
+    ]
 
-        print("Removing unused placeholders...")
-        remove_unused_placeholders(base_file_path)
+    # One event stream for the whole run: every extraction, the assembly and the save
+    progress = job.progress
+    progress.callback = progress_callback or progress.callback or print_progress
+    progress.stage_count = len(stages)
+    
+    try:
+        output_file = run_stages(stages, job)["manual"]
 
-        # Save the final document
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        info = {"project_name": ""}
-        project_info = extract_project_info(txt_path="uploads/Project_info/Project_info.txt", info=info)
-        output_file = os.path.join(output_dir, f"{project_info['project_name']}_{timestamp}.docx")
-        doc.save(output_file)
+        size_mb = timings["size"] / (1024 * 1024)
+        print(f"📦 Manual size: {size_mb:.1f} MB, generated in {time.perf_counter() - generation_start:.1f}s")
+        # The same report stays available from job.dedup.report()
+        dedup_report = format_dedup_report(job.dedup.report(), timings.get("media"))
+        if dedup_report:
+            print(dedup_report)
         
         # Clean up uploaded files after successful document generation
-        print("Cleaning up uploaded files...")
-        clean_upload_directories()
+        if shared_uploads:
+            print("Cleaning up uploaded files...")
+            clean_upload_directories()
         
         return output_file
         
     except Exception as e:
         print(f"Error generating manual: {str(e)}")
         raise
-    
-generate_manual("output/manuals")
-    
-    
\ No newline at end of file
+
+    finally:
+        # A job passed in by the caller is cleaned up by the caller, who may still need its output
+        if shared_uploads:
+            job.cleanup()
+
+
+if __name__ == "__main__":
+    generate_manual("output/manuals")
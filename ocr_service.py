@@ -0,0 +1,186 @@
+import bisect
+import io
+import math
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", os.cpu_count() or 1))
+
+# Heading crops stitched into one image per tesseract call (1 disables stitching)
+OCR_MONTAGE_BATCH = int(os.environ.get("OCR_MONTAGE_BATCH", 16))
+
+# Page segmentation modes: 3 = automatic, 6 = uniform block of text, 7 = single text line
+DEFAULT_PSM = 3
+MONTAGE_PSM = 6
+HEADING_PSM = 7
+
+# White space between stitched crops so tesseract never joins two headings into one line
+MONTAGE_GAP_PX = 40
+
+# Worker count -> warm pool; a pool is never shut down while sections may still submit to it
+_ocr_pools = {}
+_ocr_pool_lock = threading.Lock()
+
+# pytesseract, imported and configured on first use so jobs without OCR never load it
+_pytesseract = None
+
+
+def load_tesseract():
+    """
+    Import and configure pytesseract, once per process.
+
+    Returns:
+        module: pytesseract
+    """
+    global _pytesseract
+    if _pytesseract is None:
+        import pytesseract
+
+        # Set path to tesseract.exe
+        if os.environ.get("TESSERACT_CMD"):
+            pytesseract.pytesseract.tesseract_cmd = os.environ["TESSERACT_CMD"]
+        elif sys.platform == "win32":
+            pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+        _pytesseract = pytesseract
+    return _pytesseract
+
+
+def _get_ocr_pool(workers):
+    with _ocr_pool_lock:
+        if workers not in _ocr_pools:
+            _ocr_pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return _ocr_pools[workers]
+
+
+def load_image(source):
+    """
+    Open an image given as a path, encoded bytes or a PIL image.
+
+    Args:
+        source (str | bytes | Image.Image): Image to open
+
+    Returns:
+        Image.Image: The image
+    """
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(source))
+    return Image.open(source)
+
+
+def ocr_image(source, psm=DEFAULT_PSM):
+    """
+    Run tesseract on a single image.
+
+    Args:
+        source (str | bytes | Image.Image): Image to read
+        psm (int): Tesseract page segmentation mode
+
+    Returns:
+        str: Recognized text
+    """
+    return load_tesseract().image_to_string(load_image(source), config=f"--psm {psm}").strip()
+
+
+def build_montage(sources, gap=MONTAGE_GAP_PX):
+    """
+    Stack images vertically on a white canvas.
+
+    Args:
+        sources (list): Images as paths, bytes or PIL images
+        gap (int): White space between images in pixels
+
+    Returns:
+        Image.Image: The montage
+        list: Top y coordinate of each image in the montage
+    """
+    images = [load_image(source).convert("L") for source in sources]
+    width = max(image.width for image in images)
+    height = sum(image.height for image in images) + gap * (len(images) - 1)
+
+    montage = Image.new("L", (width, height), 255)
+    tops = []
+    y = 0
+    for image in images:
+        montage.paste(image, (0, y))
+        tops.append(y)
+        y += image.height + gap
+    return montage, tops
+
+
+def ocr_montage(sources, psm=MONTAGE_PSM):
+    """
+    OCR several heading crops with a single tesseract invocation.
+
+    The crops are stitched into one montage and every recognized word is
+    assigned back to the crop its vertical centre falls in.
+
+    Args:
+        sources (list): Images as paths, bytes or PIL images
+        psm (int): Tesseract page segmentation mode for the montage
+
+    Returns:
+        list: Recognized text per crop, in input order
+    """
+    montage, tops = build_montage(sources)
+    pytesseract = load_tesseract()
+    data = pytesseract.image_to_data(montage, config=f"--psm {psm}", output_type=pytesseract.Output.DICT)
+
+    # Per crop: (block, paragraph, line) -> words, in tesseract's reading order
+    lines = [{} for _ in tops]
+    for i, word in enumerate(data["text"]):
+        if not word.strip():
+            continue
+        centre = data["top"][i] + data["height"][i] / 2
+        crop = max(bisect.bisect_right(tops, centre) - 1, 0)
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines[crop].setdefault(key, []).append(word)
+
+    return ["\n".join(" ".join(words) for words in crop_lines.values()) for crop_lines in lines]
+
+
+def _ocr_batch(sources, psm):
+    if len(sources) == 1:
+        return [ocr_image(sources[0], psm=HEADING_PSM if psm is None else psm)]
+    return ocr_montage(sources, psm=MONTAGE_PSM if psm is None else psm)
+
+
+def ocr_headings(heading_images, workers=None, batch_size=None, psm=None):
+    """
+    OCR slide heading strips across a pool of worker processes.
+
+    Args:
+        heading_images (dict): slide_key -> heading crop (path, bytes or PIL image)
+        workers (int): Worker processes (OCR_WORKERS, default: number of cores)
+        batch_size (int): Crops stitched into one tesseract call (OCR_MONTAGE_BATCH).
+            With 1, each strip is read on its own in single-line mode.
+        psm (int): Override the page segmentation mode
+
+    Returns:
+        dict: slide_key -> heading text
+    """
+    keys = list(heading_images)
+    if not keys:
+        return {}
+
+    workers = workers or OCR_WORKERS
+    # Never stitch so much that some workers are left idle
+    batch_size = max(1, min(batch_size or OCR_MONTAGE_BATCH, math.ceil(len(keys) / workers)))
+    batches = [keys[i:i + batch_size] for i in range(0, len(keys), batch_size)]
+
+    if workers == 1 or len(batches) == 1:
+        results = [_ocr_batch([heading_images[key] for key in batch], psm) for batch in batches]
+    else:
+        pool = _get_ocr_pool(workers)
+        futures = [pool.submit(_ocr_batch, [heading_images[key] for key in batch], psm) for batch in batches]
+        results = [future.result() for future in futures]
+
+    headings = {}
+    for batch, texts in zip(batches, results):
+        headings.update(zip(batch, texts))
+    return headings
@@ -1,70 +1,298 @@
+import io
 import os
-from docx import Document
-from docx.shared import Inches, Pt
+import re
+import tempfile
+from docx.shared import Inches
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.oxml import OxmlElement
 from docx.text.paragraph import Paragraph
-import tempfile
-import PyPDF2
-from pdf2image import convert_from_path
-from docx import Document
-import fitz  # PyMuPDF
-from PIL import Image
-import io
-import glob
+import contextlib
+from collections import deque
+
+from image_sizing import DISPLAY_WIDTH_IN, JPEG_QUALITY, fit_image_for_docx, image_nbytes, render_dpi_for_width, target_pixel_width
+from pdf_renderer import FITZ_LOCK, render_page_image, submit_page_render
+from placeholder_index import find_placeholder
+from render_cache import enforce_size_limit, get_file, make_key, pdf_page_hash, put_file
+from utils import open_docx, save_docx, source_path
+
+PDF_MAX_IN_FLIGHT = int(os.environ.get("PDF_MAX_IN_FLIGHT", 4))
+
+# Pages rendered ahead of their insertion spill to a temporary file beyond this size per PDF
+PDF_SPOOL_MAX_BYTES = int(os.environ.get("PDF_SPOOL_MAX_MB", 64)) * 1024 * 1024
+
+# Copy the JPEG a page consists of into the manual instead of rendering the page
+PDF_EMBEDDED_IMAGES = os.environ.get("PDF_EMBEDDED_IMAGES", "1") != "0"
+
+# Share of the page a single image must cover for the page to be taken as that image
+PDF_IMAGE_PAGE_COVERAGE = float(os.environ.get("PDF_IMAGE_PAGE_COVERAGE", 0.9))
+
+# Color spaces whose JPEGs Word shows as they are (CMYK and friends are rendered);
+# an ICCBased one only when its profile has one or three components
+_PASSTHROUGH_COLORSPACES = {"DeviceRGB", "DeviceGray", "ICCBased"}
+
+_ICC_REFERENCE = re.compile(r"/ICCBased\s+(\d+)\s+\d+\s+R")
+
+
+def _icc_components(pdf, xref):
+    """
+    Get the number of color components of an image's ICCBased color space.
+
+    Taken from the profile stream's /N, or from its /Alternate color space
+    when /N is missing.
+
+    Args:
+        pdf (fitz.Document): Open PDF; hold FITZ_LOCK while calling
+        xref (int): xref of the image stream
+
+    Returns:
+        int: 1, 3 or 4, or None when it cannot be told
+    """
+    kind, value = pdf.xref_get_key(xref, "ColorSpace")
+    if kind == "xref":
+        # The [/ICCBased n 0 R] array is an object of its own
+        value = pdf.xref_object(int(value.split()[0]), compressed=True)
+    match = _ICC_REFERENCE.search(value)
+    if not match:
+        return None
+    profile = int(match.group(1))
+
+    kind, value = pdf.xref_get_key(profile, "N")
+    if kind == "int":
+        return int(value)
+    alternate = pdf.xref_get_key(profile, "Alternate")[1]
+    return {"/DeviceGray": 1, "/DeviceRGB": 3, "/DeviceCMYK": 4}.get(alternate)
+
+
+def open_pdf(pdf_path):
+    """
+    Open a PDF with PyMuPDF; hold FITZ_LOCK while using it.
+
+    Args:
+        pdf_path (str | bytes): Path to the PDF file, or its contents
+
+    Returns:
+        fitz.Document: The open PDF
+    """
+    import fitz  # PyMuPDF, loaded on first use so photo-only jobs never import it
+
+    if isinstance(pdf_path, (bytes, bytearray)):
+        return fitz.open(stream=pdf_path, filetype="pdf")
+    return fitz.open(pdf_path)
+
+
+def embedded_page_image(pdf, page):
+    """
+    Find the JPEG a PDF page consists of, such as a scanned or photographed page.
+
+    The page qualifies when it places exactly one image, upright and covering
+    at least PDF_IMAGE_PAGE_COVERAGE of it, and has nothing else visible (no
+    text other than an invisible OCR layer, no vector drawings). The image
+    must be a plain RGB or grayscale JPEG without transparency, which a DOCX
+    shows exactly as the PDF does.
+
+    Args:
+        pdf (fitz.Document): Open PDF; hold FITZ_LOCK while calling
+        page (fitz.Page): Page of the PDF
+
+    Returns:
+        int: xref of the image stream, or None when the page must be rendered
+    """
+    images = page.get_images(full=True)
+    if len(images) != 1 or page.rotation:
+        return None
+    xref, smask, _, _, _, colorspace, _, _, image_filter, _ = images[0]
+    if smask or image_filter != "DCTDecode" or colorspace not in _PASSTHROUGH_COLORSPACES:
+        return None
+    if pdf.xref_get_key(xref, "Decode")[0] != "null":
+        return None
+    # An ICC profile may describe CMYK or Lab just as well as RGB or gray
+    if colorspace == "ICCBased" and _icc_components(pdf, xref) not in (1, 3):
+        return None
+
+    # Placements of images on the page; without hashes no image is decoded
+    placements = page.get_image_info()
+    if len(placements) != 1:
+        return None
+    # Rotated, skewed or mirrored placements would show differently in the manual
+    a, b, c, d, _, _ = placements[0]["transform"]
+    if b or c or a <= 0 or d <= 0:
+        return None
+    visible = page.rect & placements[0]["bbox"]
+    if visible.is_empty or visible.get_area() < PDF_IMAGE_PAGE_COVERAGE * page.rect.get_area():
+        return None
+
+    # Text render mode 3 is invisible, as in the OCR layer of a searchable scan
+    if any(span["type"] != 3 for span in page.get_texttrace()):
+        return None
+    if page.get_drawings():
+        return None
+    return xref
+
+
+def _resolve_page(pdf_path, page_no, key, dpi, target_width, cached, future):
+    if cached:
+        try:
+            with open(cached, "rb") as f:
+                return f.read()
+        except OSError:
+            # Evicted by another process since the lookup
+            with FITZ_LOCK:
+                return render_page_image(pdf_path, page_no, dpi, target_width)
+    data = future.result()
+    put_file(key, data)
+    return data
+
+
+def iter_pdf_pages(pdf_path, dpi=None, max_in_flight=None, effective_dpi=None, embedded_images=None):
+    """
+    Render a PDF page by page as encoded image bytes.
+
+    Pages are rendered on the shared process pool, but at most max_in_flight
+    pages are queued or held at once, so peak memory stays flat however many
+    pages the PDF has. Pages already rendered from identical content with the
+    same settings come from the render cache. A page that is just one
+    embedded JPEG (see embedded_page_image) is not rendered at all: the
+    original JPEG stream is copied out as it is.
+
+    Args:
+        pdf_path (str | bytes): Path to the PDF file, or the uploaded bytes. An
+            in-memory PDF is only written to a temporary file for the pool
+            workers when some of its pages are not in the render cache.
+        dpi (int): Fixed render resolution with lossless PNG output. When None,
+            each page is rendered just large enough to be shown at the manual's
+            image width and effective_dpi, as a palette PNG or JPEG.
+        max_in_flight (int): Pages rendered ahead of the consumer (PDF_MAX_IN_FLIGHT).
+        effective_dpi (int): Resolution needed in the manual (MANUAL_EFFECTIVE_DPI).
+        embedded_images (bool): Copy out the JPEG of image-only pages (PDF_EMBEDDED_IMAGES).
+
+    Yields:
+        tuple: (page number, image bytes, True when the bytes are the page's
+            original JPEG) in page order
+    """
+    in_memory = isinstance(pdf_path, (bytes, bytearray))
+    if not in_memory and not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF not found: {pdf_path}")
+    if embedded_images is None:
+        embedded_images = PDF_EMBEDDED_IMAGES
+
+    max_in_flight = max(1, max_in_flight or PDF_MAX_IN_FLIGHT)
+    # (cache key, render dpi, target width) per page, or the xref of its JPEG
+    page_specs = []
+    with contextlib.ExitStack() as stack:
+        with FITZ_LOCK:
+            pdf = stack.enter_context(open_pdf(pdf_path))
+            for page in pdf:
+                xref = embedded_page_image(pdf, page) if embedded_images else None
+                if xref is not None:
+                    page_specs.append(xref)
+                    continue
+                page_hash = pdf_page_hash(pdf, page)
+                if dpi:
+                    page_specs.append((make_key(page_hash, "pdf_page", dpi), dpi, None))
+                else:
+                    target_width = target_pixel_width(DISPLAY_WIDTH_IN, effective_dpi)
+                    page_dpi = render_dpi_for_width(page.rect.width, DISPLAY_WIDTH_IN, effective_dpi)
+                    key = make_key(page_hash, "pdf_page_docx", page_dpi, target_width, JPEG_QUALITY)
+                    page_specs.append((key, page_dpi, target_width))
+        embedded_pages = sum(1 for spec in page_specs if isinstance(spec, int))
+        if not embedded_pages:
+            stack.close()
+
+        def resolve(page_no, entry):
+            if isinstance(entry, int):
+                with FITZ_LOCK:
+                    return page_no, pdf.xref_stream_raw(entry), True
+            return page_no, _resolve_page(pdf_path, page_no, *entry), False
 
+        cached_files = [None if isinstance(spec, int) else get_file(spec[0]) for spec in page_specs]
+        cached_pages = sum(1 for cached in cached_files if cached)
+        # Pool workers open the PDF themselves; with every page cached it is not written out
+        needs_render = cached_pages + embedded_pages < len(page_specs)
+        with source_path(pdf_path, ".pdf") if needs_render else contextlib.nullcontext(pdf_path) as render_path:
+            pending = deque()
+            for page_no, (spec, cached) in enumerate(zip(page_specs, cached_files), start=1):
+                if isinstance(spec, int):
+                    pending.append((page_no, spec))
+                else:
+                    key, page_dpi, target_width = spec
+                    future = None if cached else submit_page_render(render_path, page_no, page_dpi, target_width)
+                    pending.append((page_no, (key, page_dpi, target_width, cached, future)))
 
-def pdf_to_images(pdf_path, output_dir):
+                if len(pending) >= max_in_flight:
+                    yield resolve(*pending.popleft())
+
+            while pending:
+                yield resolve(*pending.popleft())
+
+    if embedded_pages:
+        print(f"🖼️ {embedded_pages} of {len(page_specs)} page(s) copied as their embedded JPEG")
+    print(f"♻️ {cached_pages} of {len(page_specs) - embedded_pages} rendered page(s) came from the render cache")
+    enforce_size_limit()
+
+
+def pdf_to_images(pdf_path, output_dir, dpi=300):
     """
     Converts each page of the PDF into a separate image and saves them in the output directory.
+    Pages that are just one embedded JPEG are saved as that JPEG instead of a PNG.
 
     Args:
         pdf_path (str): Path to the PDF file.
         output_dir (str): Directory to save the output images.
+        dpi (int): Render resolution.
+
+    Returns:
+        list: Paths of the saved images in page order.
     """
-    if not os.path.exists(pdf_path):
-        raise FileNotFoundError(f"PDF not found: {pdf_path}")
-    
     os.makedirs(output_dir, exist_ok=True)
 
     # Convert PDF to images
     print(f"🔄 Converting PDF pages to images from: {pdf_path}")
-    images = convert_from_path(pdf_path, dpi=300)
-
-    for i, img in enumerate(images):
-        image_path = os.path.join(output_dir, f"PDF_page_{i+1}.png")
-        img.save(image_path, "PNG")
-        print(f"✅ Saved: {image_path}")
+    image_paths = []
+    for page_no, image, embedded in iter_pdf_pages(pdf_path, dpi=dpi):
+        image_path = os.path.join(output_dir, f"PDF_page_{page_no}.{'jpg' if embedded else 'png'}")
+        with open(image_path, "wb") as f:
+            f.write(image)
+        image_paths.append(image_path)
 
     print("📁 All pages saved as images.")
+    return image_paths
 
-def insert_pdf_images_at_placeholder(docx_path, output_dir, placeholder):
+def insert_pdf_images_at_placeholder(docx_path, output_dir, placeholder, images=None, progress=None, fit=True):
     """
     Inserts all images from image_dir into the docx file at the placeholder location.
 
     Args:
-        docx_path (str): Path to the .docx file (will be updated in-place).
-        image_dir (str): Directory containing image files to insert.
+        docx_path (str | Document): Path to the .docx file (will be updated in-place)
+            or an open Document shared by the pipeline.
+        output_dir (str): Directory containing image files to insert.
         placeholder (str): Placeholder text to be replaced with images.
+        images (iterable): Images to insert instead of the files in output_dir, as
+            paths or encoded bytes. Consumed one at a time, so a generator such
+            as iter_pdf_pages never has to hold the whole document. Images
+            wider than the manual needs are downscaled and re-encoded.
+        progress (StageProgress): Told the bytes of every inserted image
+        fit (bool): Downscale the images; False when the caller has already
+            prepared them (or they must be inserted as they are)
     """
-    doc = Document(docx_path)
+    doc = open_docx(docx_path)
     image_width = 6.0
-    # Sort image files (natural order)
-    image_files = sorted(
-        [f for f in os.listdir(output_dir) if f.lower().endswith((".png", ".jpg", ".jpeg"))],
-        key=lambda x: int("".join(filter(str.isdigit, x)) or 0)
-    )
 
-    if not image_files:
-        print("⚠️ No image files found to insert.")
-        return
+    if images is None:
+        # Sort image files (natural order)
+        image_files = sorted(
+            [f for f in os.listdir(output_dir) if f.lower().endswith((".png", ".jpg", ".jpeg"))],
+            key=lambda x: int("".join(filter(str.isdigit, x)) or 0)
+        )
+
+        if not image_files:
+            print("⚠️ No image files found to insert.")
+            return
+
+        images = (os.path.join(output_dir, img_name) for img_name in image_files)
 
     # Locate placeholder
-    for i, para in enumerate(doc.paragraphs):
-        if placeholder in para.text:
-            placeholder_para = para
-            break
-    else:
+    placeholder_para = find_placeholder(doc, placeholder)
+    if placeholder_para is None:
         raise ValueError(f"❌ Placeholder '{placeholder}' not found in the document.")
 
     # Clear placeholder text
@@ -77,87 +305,181 @@ def insert_pdf_images_at_placeholder(docx_path, output_dir, placeholder):
 
     # Insert images after placeholder
     current_para = placeholder_para
-    for img_name in image_files:
-        img_path = os.path.join(output_dir, img_name)
+    inserted = 0
+    for image in images:
+        # Downscale and re-encode anything larger than the manual needs
+        if fit:
+            image = fit_image_for_docx(image)
+        elif isinstance(image, (bytes, bytearray)):
+            image = io.BytesIO(image)
 
         new_para = insert_paragraph_after(current_para)
         run = new_para.add_run()
-        run.add_picture(img_path, width=Inches(image_width))
+        run.add_picture(image, width=Inches(image_width))
         new_para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
 
         # Optional: add break
         current_para = insert_paragraph_after(new_para)
         current_para.add_run().add_break()
+        inserted += 1
+        if progress is not None:
+            progress.update(bytes_written=image_nbytes(image))
 
-    doc.save(docx_path)
-    print(f"✅ Updated DOCX saved: {docx_path}")
+    if inserted == 0:
+        print("⚠️ No image files found to insert.")
 
-def process_eplan_pdf_to_docx(folder_path, template_path):
+    if save_docx(doc, docx_path):
+        print(f"✅ Updated DOCX saved: {docx_path}")
+
+def _image_bytes(image):
+    if isinstance(image, io.BytesIO):
+        return image.getvalue()
+    if isinstance(image, (str, os.PathLike)):
+        with open(image, "rb") as f:
+            return f.read()
+    return image
+
+
+class RenderedPages:
     """
-    Extracts headings and images from a EPLAN PowerPoint and inserts them into a DOCX template.
+    Encoded pages of a PDF, rendered by its extraction stage for its insertion.
 
-    Args:
-        folder_path (str): Path to the folder containing the EPLAN PowerPoint file.
-        template_path (str): Path to the base DOCX template.
-        output_docx_path (str): Path to save the final generated manual.
-        placeholder (str): Placeholder text in the DOCX to be replaced.
+    Pages are appended to a spooled temporary file: they stay in memory up to
+    PDF_SPOOL_MAX_MB and move to an anonymous temporary file beyond that, so
+    a large drawing set is not held in RAM until the manual is assembled.
     """
-    pdf_files = glob.glob(os.path.join(folder_path, "*.pdf"))
-    if len(pdf_files) == 0:
-        print("⚠️ No PDF file found in EPLAN folder. Aborting.")
-        return
-    elif len(pdf_files) > 1:
-        print("⚠️ Multiple PDF files found in EPLAN folder. Aborting.")
-        return
 
-    pdf_path = pdf_files[0]
-    # print(f"📂 Found PDF file: {pdf_path}")
+    def __init__(self, max_size=None):
+        self._file = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_BYTES if max_size is None else max_size)
+        self._sizes = []
 
-    output_dir = os.path.abspath("eplan_img_extracted")
-    placeholder= "{{Upload_Electrical_drawing_here}}"
+    def append(self, image):
+        """Add the encoded image of the next page."""
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(image)
+        self._sizes.append(len(image))
 
-    # Step 1: Extract slide data (images + headings via OCR)
-    print("Extracting EPLAN slide data...")
-    # pdf_to_images(pdf_path, output_dir)
+    def __len__(self):
+        return len(self._sizes)
 
-    print("Inserting EPLAN slide data into DOCX...")
-    # Step 2: Insert extracted data into DOCX
-    insert_pdf_images_at_placeholder(
-        docx_path = template_path, 
-        output_dir = output_dir, 
-        placeholder = placeholder)
+    def __iter__(self):
+        """Yield the encoded pages in page order; the pages can be read again."""
+        offset = 0
+        for size in self._sizes:
+            self._file.seek(offset)
+            yield self._file.read(size)
+            offset += size
+
+
+def _prepared_pages(job, pdf_path, dpi):
+    """Yield the pages of a PDF encoded as they go into the manual, in page order."""
+    for page_no, image, embedded in iter_pdf_pages(pdf_path, dpi):
+        # Embedded JPEGs go in untouched, at their original quality
+        if embedded:
+            yield image
+            continue
+        # A rendered page that duplicates an earlier one (in any section) gets its
+        # bytes, so the manual stores the image once
+        batch = job.dedup.match("pdf_page", {page_no: image})
+        fitted = {key: _image_bytes(fit_image_for_docx(page)) for key, page in batch.unique.items()}
+        yield batch.resolve(fitted)[page_no]
 
-def process_alarms_pdf_to_docx(folder_path, template_path):
+
+def find_section_pdf(job, category, label):
     """
-    Extracts headings and images from a Alarms pdf and inserts them into a DOCX template.
+    Find the single PDF uploaded to a job section.
 
     Args:
-        folder_path (str): Path to the folder containing the Alarms pdf file.
-        template_path (str): Path to the base DOCX template.
-        output_docx_path (str): Path to save the final generated manual.
-        placeholder (str): Placeholder text in the DOCX to be replaced.
+        job (Job): Job to look in
+        category (str): Upload category, e.g. "Alarms"
+        label (str): Section name used in messages
+
+    Returns:
+        str | bytes: Path to the PDF or its contents when kept in memory, or
+            None when there is none or more than one
     """
-    pdf_files = glob.glob(os.path.join(folder_path, "*.pdf"))
+    pdf_files = job.input_files(category, (".pdf",))
     if len(pdf_files) == 0:
-        print("⚠️ No PDF file found in Alarms folder. Aborting.")
-        return
+        print(f"⚠️ No PDF file found in {label} folder. Aborting.")
+        return None
     elif len(pdf_files) > 1:
-        print("⚠️ Multiple PDF files found in Alarms folder. Aborting.")
-        return
+        print(f"⚠️ Multiple PDF files found in {label} folder. Aborting.")
+        return None
+    return pdf_files[0]
+
+
+def prerender_pdf_section(job, category, label, progress=None, dpi=None):
+    """
+    Render every page of a section's PDF ahead of its insertion.
 
-    pdf_path = pdf_files[0]
-    # print(f"📂 Found PDF file: {pdf_path}")
+    Runs as an extraction stage alongside the other sections. The pages are
+    encoded exactly as they go into the manual and kept on job.extracted, so
+    the insertion only has to place them.
 
-    output_dir = os.path.abspath("alarms_img_extracted")
-    placeholder= "{{Upload_alarms_doc_here}}"
+    Args:
+        job (Job): Job whose upload is rendered; the pages are kept on job.extracted
+        category (str): Upload category, e.g. "E-PLAN_Drawing"
+        label (str): Section name used in messages
+        progress (StageProgress): Advanced by one page per rendered page
+        dpi (int): Fixed render resolution (None sizes each page to the manual)
+
+    Returns:
+        RenderedPages: The encoded pages, or None when the section has no PDF
+    """
+    pdf_path = find_section_pdf(job, category, label)
+    job.extracted[category] = None
+    if pdf_path is None:
+        return None
 
-    # Step 1: Extract slide data (images + headings via OCR)
-    print("Extracting Alarms slide data...")
-    pdf_to_images(pdf_path, output_dir)
+    print(f"Rendering {label} pages...")
+    with FITZ_LOCK, open_pdf(pdf_path) as pdf:
+        page_count = pdf.page_count
+    if progress is not None:
+        progress.update(total=page_count, unit="pages")
+    pages = RenderedPages()
+    for image in _prepared_pages(job, pdf_path, dpi):
+        pages.append(image)
+        if progress is not None:
+            progress.update(advance=1)
+    job.extracted[category] = pages
+    return pages
+
+
+def insert_pdf_section(job, template_path, category, label, placeholder, progress=None, dpi=None):
+    """
+    Insert the pages of a section's PDF into a DOCX template.
+
+    Pages rendered by prerender_pdf_section are taken from job.extracted;
+    without that stage, the pages are rendered here and inserted one by one.
+
+    Args:
+        job (Job): Job whose upload is processed
+        template_path (str | Document): Path to the base DOCX template or an open Document
+        category (str): Upload category, e.g. "Alarms"
+        label (str): Section name used in messages and the scratch folder
+        placeholder (str): Placeholder the pages replace
+        progress (StageProgress): Told the bytes inserted
+        dpi (int): Fixed render resolution (None sizes each page to the manual)
+    """
+    if category in job.extracted:
+        pages = job.extracted[category]
+        if pages is None:
+            return
+        print(f"Inserting {label} pages into DOCX...")
+    else:
+        pdf_path = find_section_pdf(job, category, label)
+        if pdf_path is None:
+            return
+        # Render pages one at a time (or read them back from the render cache)
+        # and insert each as soon as it is ready
+        print(f"Extracting and inserting {label} pages into DOCX...")
+        pages = _prepared_pages(job, pdf_path, dpi)
 
-    print("Inserting Alarms slide data into DOCX...")
-    # Step 2: Insert extracted data into DOCX
+    output_dir = job.work_dir(f"{label.lower()}_img_extracted", create=False)
     insert_pdf_images_at_placeholder(
         docx_path = template_path, 
         output_dir = output_dir, 
-        placeholder = placeholder)
+        placeholder = placeholder,
+        images = pages,
+        progress = progress,
+        fit = False)
@@ -0,0 +1,194 @@
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+PDF_RENDER_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", os.cpu_count() or 1))
+
+# Worker count -> warm process pool shared by every render call in this process;
+# a pool is never shut down while other sections may still submit to it
+_render_pools = {}
+_render_pool_lock = threading.Lock()
+
+# MuPDF is not thread-safe; hold this around any PyMuPDF call made in this
+# process rather than in a pool worker
+FITZ_LOCK = threading.RLock()
+
+
+def _get_render_pool(workers):
+    with _render_pool_lock:
+        if workers not in _render_pools:
+            _render_pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return _render_pools[workers]
+
+
+def _render_pages(pdf_path, page_numbers, dpi, output_dir, name_format):
+    """
+    Render the given 1-based pages of a PDF to PNG files.
+
+    Runs in a pool worker; each worker opens the document on its own and
+    writes every page as soon as it is rendered.
+    """
+    import fitz
+
+    paths = []
+    with fitz.open(pdf_path) as pdf:
+        for page_no in page_numbers:
+            pix = pdf[page_no - 1].get_pixmap(dpi=dpi)
+            path = os.path.join(output_dir, name_format.format(page_no))
+            pix.save(path)
+            paths.append(path)
+    return paths
+
+
+# Document kept open by a pool worker between pages: (key, fitz.Document, in-memory source)
+_worker_pdf = (None, None, None)
+
+
+def _open_in_worker(pdf_path):
+    global _worker_pdf
+    import fitz
+
+    if isinstance(pdf_path, (bytes, bytearray)):
+        # The source is held alongside the document, so its id is not reused while cached
+        key = ("stream", id(pdf_path), len(pdf_path))
+    else:
+        stat = os.stat(pdf_path)
+        key = (os.path.abspath(pdf_path), stat.st_mtime, stat.st_size)
+    if _worker_pdf[0] != key:
+        if _worker_pdf[1] is not None:
+            _worker_pdf[1].close()
+        if isinstance(pdf_path, (bytes, bytearray)):
+            _worker_pdf = (key, fitz.open(stream=pdf_path, filetype="pdf"), pdf_path)
+        else:
+            _worker_pdf = (key, fitz.open(pdf_path), None)
+    return _worker_pdf[1]
+
+
+def render_page_image(pdf_path, page_no, dpi, target_width=None):
+    """
+    Render one 1-based page of a PDF to encoded image bytes.
+
+    The bitmap is encoded and released inside this call, so only the
+    compressed page ever leaves the worker.
+
+    Args:
+        pdf_path (str | bytes): Path to the PDF, or its contents when rendered in-process
+            (pool workers only get paths; see submit_page_render)
+        page_no (int): 1-based page number
+        dpi (int): Render resolution
+        target_width (int): When set, the page is fitted to this pixel width and
+            encoded for the manual (palette PNG or JPEG); otherwise lossless PNG
+
+    Returns:
+        bytes: Encoded image
+    """
+    pix = _open_in_worker(pdf_path)[page_no - 1].get_pixmap(dpi=dpi)
+    if target_width is None:
+        return pix.tobytes("png")
+
+    from PIL import Image
+    from image_sizing import encode_for_docx
+
+    image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    return encode_for_docx(image, target_width)
+
+
+def submit_page_render(pdf_path, page_no, dpi, target_width=None, workers=None):
+    """
+    Queue one page for rendering on the shared process pool.
+
+    The PDF must be a file: bytes would be pickled with every page and never
+    match the document a worker keeps open (see utils.source_path).
+
+    Returns:
+        Future: Resolves to the encoded image bytes (see render_page_image)
+
+    Raises:
+        TypeError: When pdf_path is the PDF's contents rather than a path
+    """
+    if isinstance(pdf_path, (bytes, bytearray)):
+        raise TypeError("submit_page_render needs the path of a PDF file, not its contents")
+    return _get_render_pool(workers or PDF_RENDER_WORKERS).submit(render_page_image, pdf_path, page_no, dpi, target_width)
+
+
+def render_pdf_pages_parallel(pdf_path, output_dir, dpi, workers=None, name_format="PDF_page_{}.png", pages=None):
+    """
+    Render pages of a PDF to PNG with PyMuPDF, split across a pool of worker processes.
+
+    Args:
+        pdf_path (str): Path to the PDF
+        output_dir (str): Directory to write the images to
+        dpi (int): Render resolution
+        workers (int): Number of worker processes (PDF_RENDER_WORKERS, default: number of cores)
+        name_format (str): File name pattern, formatted with the 1-based page number
+        pages (list): 1-based page numbers to render (all pages when None)
+
+    Returns:
+        list: Image paths in page order
+    """
+    import fitz
+
+    workers = workers or PDF_RENDER_WORKERS
+    with FITZ_LOCK, fitz.open(pdf_path) as pdf:
+        page_count = pdf.page_count
+    if pages is None:
+        pages = range(1, page_count + 1)
+    pages = [page_no for page_no in sorted(pages) if 1 <= page_no <= page_count]
+    if not pages:
+        return []
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Several small page ranges per worker keep the pool busy when pages differ in cost
+    chunk = max(1, math.ceil(len(pages) / (workers * 4)))
+    ranges = [pages[i:i + chunk] for i in range(0, len(pages), chunk)]
+
+    if workers == 1 or len(ranges) == 1:
+        with FITZ_LOCK:
+            return [path for page_range in ranges for path in _render_pages(pdf_path, page_range, dpi, output_dir, name_format)]
+
+    pool = _get_render_pool(workers)
+    futures = {
+        pool.submit(_render_pages, pdf_path, page_range, dpi, output_dir, name_format): page_range
+        for page_range in ranges
+    }
+
+    done = 0
+    paths_by_range = {}
+    for future in as_completed(futures):
+        page_range = futures[future]
+        paths_by_range[page_range[0]] = future.result()
+        done += len(page_range)
+        print(f"🖨️ Rendered {done}/{len(pages)} pages")
+
+    return [path for first in sorted(paths_by_range) for path in paths_by_range[first]]
+
+
+def render_pdf_pages_to_bytes(pdf_path, dpi, workers=None, pages=None):
+    """
+    Render pages of a PDF to PNG bytes in memory, split across the render pool.
+
+    Args:
+        pdf_path (str): Path to the PDF
+        dpi (int): Render resolution
+        workers (int): Number of worker processes (PDF_RENDER_WORKERS, default: number of cores)
+        pages (list): 1-based page numbers to render (all pages when None)
+
+    Returns:
+        dict: 1-based page number -> PNG bytes, in page order
+    """
+    import fitz
+
+    workers = workers or PDF_RENDER_WORKERS
+    with FITZ_LOCK, fitz.open(pdf_path) as pdf:
+        page_count = pdf.page_count
+        if pages is None:
+            pages = range(1, page_count + 1)
+        pages = [page_no for page_no in sorted(pages) if 1 <= page_no <= page_count]
+
+        if workers == 1 or len(pages) <= 1:
+            return {page_no: pdf[page_no - 1].get_pixmap(dpi=dpi).tobytes("png") for page_no in pages}
+
+    futures = {page_no: submit_page_render(pdf_path, page_no, dpi, workers=workers) for page_no in pages}
+    return {page_no: future.result() for page_no, future in futures.items()}
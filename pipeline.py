@@ -0,0 +1,113 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Stages of one job that may run at the same time
+SECTION_WORKERS = int(os.environ.get("MANUAL_SECTION_WORKERS", 4))
+
+
+class Stage:
+    """
+    One node of the manual generation DAG.
+
+    A stage runs as soon as every output named in its inputs has been
+    produced, so stages that do not depend on each other run concurrently.
+    """
+
+    def __init__(self, name, run, inputs=(), outputs=(), unit="items"):
+        """
+        Args:
+            name (str): Stage name shown in progress events
+            run (callable): run(job, progress) -> value of the single output, a
+                tuple with one value per output, or None when there are none
+            inputs (tuple): Outputs of other stages this stage needs
+            outputs (tuple): Names of what this stage produces
+            unit (str): What the stage's progress items are
+        """
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.unit = unit
+
+
+def validate_stages(stages):
+    """
+    Check that every input is produced by exactly one stage and that there is no cycle.
+
+    Raises:
+        ValueError: Describing the first problem found
+    """
+    produced_by = {}
+    for stage in stages:
+        for output in stage.outputs:
+            if output in produced_by:
+                raise ValueError(f"'{output}' is produced by both '{produced_by[output]}' and '{stage.name}'")
+            produced_by[output] = stage.name
+
+    for stage in stages:
+        for name in stage.inputs:
+            if name not in produced_by:
+                raise ValueError(f"Stage '{stage.name}' needs '{name}', which no stage produces")
+
+    available = set()
+    remaining = list(stages)
+    while remaining:
+        ready = [stage for stage in remaining if all(name in available for name in stage.inputs)]
+        if not ready:
+            raise ValueError(f"Stages form a cycle: {', '.join(stage.name for stage in remaining)}")
+        for stage in ready:
+            remaining.remove(stage)
+            available.update(stage.outputs)
+
+
+def _run_stage(stage, job):
+    progress = job.progress.start_stage(stage.name, unit=stage.unit)
+    value = stage.run(job, progress)
+    progress.end()
+    return value
+
+
+def run_stages(stages, job, workers=None):
+    """
+    Run a DAG of stages for a job, each stage as soon as its inputs exist.
+
+    Stages run on a thread pool, so they share the job's progress, its
+    dedup index and the shared process pools, and their results (parsed
+    documents, table elements) can be inserted without being pickled. Slide
+    and page rendering and OCR run on those process pools and overlap fully.
+    Work done in the stage itself holds the GIL, such as reading a BOM
+    workbook, parsing a .docx upload or finding PDF tables. It overlaps with
+    other sections' pool work but not with another such stage.
+
+    Args:
+        stages (list): Stage objects
+        job (Job): Job passed to every stage
+        workers (int): Stages run at the same time (MANUAL_SECTION_WORKERS)
+
+    Returns:
+        dict: Output name -> value
+    """
+    validate_stages(stages)
+
+    results = {}
+    remaining = list(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers or SECTION_WORKERS)) as pool:
+        while remaining or running:
+            for stage in [stage for stage in remaining if all(name in results for name in stage.inputs)]:
+                remaining.remove(stage)
+                running[pool.submit(_run_stage, stage, job)] = stage
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    value = future.result()
+                except Exception:
+                    # Let running stages finish, but start nothing new
+                    remaining.clear()
+                    raise
+                if len(stage.outputs) == 1:
+                    value = (value,)
+                results.update(zip(stage.outputs, value or ()))
+    return results
@@ -0,0 +1,220 @@
+import re
+import weakref
+
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{[^{}]+\}\}")
+
+W_P = qn("w:p")
+W_T = qn("w:t")
+
+# Document root element -> PlaceholderIndex bound to that document's XML tree
+_document_indexes = weakref.WeakKeyDictionary()
+
+
+class PlaceholderIndex:
+    """
+    Placeholder -> paragraph lookup for one open Document.
+
+    Entries hold references to the w:p elements themselves, so paragraphs
+    inserted before or after a placeholder do not invalidate the index.
+    """
+
+    def __init__(self, entries):
+        self._entries = entries
+
+    def placeholders(self):
+        """
+        Returns:
+            list: Placeholders that are still present in the document
+        """
+        return [placeholder for placeholder in self._entries if self.paragraphs(placeholder)]
+
+    def paragraphs(self, placeholder):
+        """
+        Get every paragraph that still contains the placeholder.
+
+        Args:
+            placeholder (str): Placeholder text, e.g. "{{Upload_SOP_here}}"
+
+        Returns:
+            list: Paragraph objects in document order
+        """
+        found = []
+        live = []
+        for p, parent in self._entries.get(placeholder, ()):
+            para = Paragraph(p, parent)
+            if placeholder in para.text:
+                found.append(para)
+                live.append((p, parent))
+
+        # Drop entries whose placeholder has already been replaced
+        if placeholder in self._entries:
+            if live:
+                self._entries[placeholder] = live
+            else:
+                del self._entries[placeholder]
+        return found
+
+    def find(self, placeholder):
+        """
+        Get the first paragraph that still contains the placeholder.
+
+        Args:
+            placeholder (str): Placeholder text
+
+        Returns:
+            Paragraph: The paragraph, or None if the placeholder is not in the document
+        """
+        paragraphs = self.paragraphs(placeholder)
+        return paragraphs[0] if paragraphs else None
+
+    def remove_placeholders(self, placeholders):
+        """
+        Strip the given placeholders from every paragraph that still holds them.
+
+        Args:
+            placeholders (list): Placeholder texts to remove
+
+        Returns:
+            int: Number of paragraphs that were changed
+        """
+        changed = 0
+        for placeholder in placeholders:
+            for para in self.paragraphs(placeholder):
+                para.text = para.text.replace(placeholder, "")
+                changed += 1
+        return changed
+
+
+def _stories(doc):
+    """
+    Yield every story of the document that can hold placeholders.
+
+    Yields:
+        tuple: (story key, root XML element, parent object for Paragraph)
+    """
+    yield "body", doc.element.body, doc._body
+
+    seen = set()
+    for section in doc.sections:
+        for story in (
+            section.header, section.first_page_header, section.even_page_header,
+            section.footer, section.first_page_footer, section.even_page_footer,
+        ):
+            # Linked headers/footers have no part of their own; touching them would add one
+            if story.is_linked_to_previous:
+                continue
+            key = str(story.part.partname)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield key, story._element, story
+
+
+def _paragraph_text(p):
+    """Text of a w:p without the text of paragraphs nested in its text boxes."""
+    return "".join(
+        t.text or "" for t in p.iter(W_T) if next(t.iterancestors(W_P), None) is p
+    )
+
+
+def _compile_story(root):
+    """
+    Walk one story tree once and map each placeholder to its paragraph paths.
+
+    Tables, text boxes and content controls are covered because the walk
+    descends into every element, not just top-level paragraphs.
+
+    Returns:
+        dict: {placeholder: [child index path, ...]}
+    """
+    compiled = {}
+    stack = [(root, ())]
+    while stack:
+        element, path = stack.pop()
+        if element.tag == W_P:
+            for placeholder in PLACEHOLDER_PATTERN.findall(_paragraph_text(element)):
+                paths = compiled.setdefault(placeholder, [])
+                if not paths or paths[-1] != path:
+                    paths.append(path)
+        # Push children in reverse so paragraphs come off the stack in document order
+        for i, child in reversed(list(enumerate(element))):
+            if isinstance(child.tag, str):
+                stack.append((child, path + (i,)))
+    return compiled
+
+
+def _resolve(root, path):
+    element = root
+    for i in path:
+        element = element[i]
+    return element
+
+
+def compile_document(doc):
+    """
+    Compile the placeholder locations of an open Document.
+
+    Returns:
+        dict: {story key: {placeholder: [child index path, ...]}}
+    """
+    return {key: _compile_story(root) for key, root, _ in _stories(doc)}
+
+
+def _bind(doc, compiled):
+    entries = {}
+    for key, root, parent in _stories(doc):
+        for placeholder, paths in compiled.get(key, {}).items():
+            entries.setdefault(placeholder, []).extend(
+                (_resolve(root, path), parent) for path in paths
+            )
+    index = PlaceholderIndex(entries)
+    _document_indexes[doc.element] = index
+    return index
+
+
+def bind_compiled(doc, compiled):
+    """
+    Attach an already compiled index to an unmodified copy of its template
+    (see template_cache, which keeps the compiled index with the parsed template).
+
+    Args:
+        doc (Document): Unmodified copy of the template
+        compiled (dict): Result of compile_document on the template
+
+    Returns:
+        PlaceholderIndex: Index bound to doc
+    """
+    return _bind(doc, compiled)
+
+
+def get_placeholder_index(doc):
+    """
+    Get the placeholder index of a document, compiling it on first use.
+
+    Args:
+        doc (Document): Document object
+
+    Returns:
+        PlaceholderIndex: Index bound to doc
+    """
+    index = _document_indexes.get(doc.element)
+    if index is None:
+        index = _bind(doc, compile_document(doc))
+    return index
+
+
+def find_placeholder(doc, placeholder):
+    """
+    Find the first paragraph containing a placeholder.
+
+    Args:
+        doc (Document): Document object
+        placeholder (str): Placeholder text
+
+    Returns:
+        Paragraph: The paragraph, or None if the placeholder is not in the document
+    """
+    return get_placeholder_index(doc).find(placeholder)
@@ -1,57 +1,181 @@
-from pptx import Presentation
-from docx import Document
 from docx.shared import Inches
 from docx.shared import Pt
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
 from docx.text.paragraph import Paragraph
-from docx.oxml.shared import qn as qn_shared
 
-import glob
+import functools
+import io
 import os
-import win32com.client
 from PIL import Image, ImageDraw, ImageFont
-import re
 
-import pytesseract
+from dedup_index import DedupIndex
+from image_sizing import JPEG_QUALITY, encode_for_docx, fit_image_for_docx, image_nbytes, target_pixel_width
+from ocr_service import ocr_headings, ocr_image
+from placeholder_index import find_placeholder
+from render_cache import enforce_size_limit, get_file, get_text, make_key, put_file, put_text, slide_content_hash
+from slide_rasterizer import get_rasterizer
+from utils import open_docx, open_source, save_docx, source_path
 
-# Set path to tesseract.exe
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+# Image formats python-docx can embed as-is
+DOCX_IMAGE_TYPES = {"image/png", "image/jpeg", "image/gif", "image/bmp", "image/x-ms-bmp", "image/tiff"}
 
-def export_slides_as_images(pptx_path, output_dir):
+# Share of the slide area a picture must cover to count as the slide's main content
+PICTURE_SLIDE_MIN_COVERAGE = 0.5
+
+# Top strip of a slide that holds the heading (116 px of a 720 px tall export)
+HEADING_TOP_PX = 116
+HEADING_REFERENCE_HEIGHT = 720
+HEADING_WIDTH_RATIO = 0.73
+
+# Write rendered slides and crops to output_dir for inspection; normally they stay in memory
+SAVE_DEBUG_ARTIFACTS = os.environ.get("MANUAL_DEBUG_ARTIFACTS", "").lower() in ("1", "true", "yes")
+
+
+def export_slides_as_images(pptx_path, output_dir, rasterizer=None, slides=None):
+    """
+    Render slides of a presentation to output_dir/Slide{n}.png.
+
+    Args:
+        pptx_path (str): Path to the PowerPoint file
+        output_dir (str): Directory to save the slide images
+        rasterizer (SlideRasterizer): Backend to use (see slide_rasterizer.get_rasterizer)
+        slides (list): 1-based slide numbers to render (all slides when None)
+
+    Returns:
+        list: Image paths in slide order
+    """
     pptx_path = os.path.abspath(pptx_path)
     if not os.path.exists(pptx_path):
         raise FileNotFoundError(f"PPTX file not found: {pptx_path}")
 
-    ppt_app = win32com.client.Dispatch("PowerPoint.Application")
-    ppt_app.Visible = 1
-    presentation = ppt_app.Presentations.Open(pptx_path, WithWindow=False)
-    os.makedirs(output_dir, exist_ok=True)
-    presentation.SaveAs(output_dir, 17)  # 17 = export as PNG
-    presentation.Close()
-    ppt_app.Quit()
+    rasterizer = rasterizer or get_rasterizer()
+    return rasterizer.render(pptx_path, output_dir, slides=slides)
+
+
+def _shapes_overlap(a, b):
+    return (
+        a.left < b.left + b.width and b.left < a.left + a.width
+        and a.top < b.top + b.height and b.top < a.top + a.height
+    )
+
+
+def get_slide_heading(slide, slide_height):
+    """
+    Get a slide's heading from its text.
 
+    Uses the title placeholder first, then the top-most text frame that starts
+    inside the heading strip.
 
-def remove_logo_and_extract_heading(image_path, save_main_path=None, save_heading_path=None, top_px=116):
-    image = Image.open(image_path)
+    Args:
+        slide (Slide): python-pptx slide
+        slide_height (int): Slide height in EMU
+
+    Returns:
+        str: Heading text, or "" if the heading only exists as pixels
+    """
+    title = slide.shapes.title
+    if title is not None and title.has_text_frame and title.text_frame.text.strip():
+        return " ".join(title.text_frame.text.split())
+
+    band = slide_height * HEADING_TOP_PX / HEADING_REFERENCE_HEIGHT
+    candidates = [
+        shape for shape in slide.shapes
+        if shape.has_text_frame and shape.text_frame.text.strip()
+        and shape.top is not None and shape.top < band
+    ]
+    if not candidates:
+        return ""
+    top_most = min(candidates, key=lambda shape: (shape.top, shape.left))
+    return " ".join(top_most.text_frame.text.split())
+
+
+def get_single_picture(slide, slide_width, slide_height, min_coverage=PICTURE_SLIDE_MIN_COVERAGE):
+    """
+    Get the picture shape if a slide's main content is one embedded picture.
+
+    Text placeholders and text boxes (headings, captions) are allowed as long as
+    they do not overlap the picture. Any other shape, a cropped or rotated
+    picture, or an image format Word cannot embed means the slide must be rendered.
+
+    Args:
+        slide (Slide): python-pptx slide
+        slide_width (int): Slide width in EMU
+        slide_height (int): Slide height in EMU
+        min_coverage (float): Share of the slide the picture must cover
+
+    Returns:
+        Picture: The picture shape, or None if the slide needs rendering
+    """
+    from pptx.enum.shapes import MSO_SHAPE_TYPE
+    from pptx.shapes.picture import Picture
+
+    picture = None
+    text_shapes = []
+    for shape in slide.shapes:
+        if isinstance(shape, Picture):
+            if picture is not None:
+                return None
+            picture = shape
+        elif shape.has_text_frame and (shape.is_placeholder or shape.shape_type == MSO_SHAPE_TYPE.TEXT_BOX):
+            text_shapes.append(shape)
+        else:
+            return None
+
+    if picture is None:
+        return None
+    try:
+        content_type = picture.image.content_type
+    except ValueError:
+        # Linked rather than embedded image
+        return None
+    if content_type not in DOCX_IMAGE_TYPES:
+        return None
+    if picture.rotation or any((picture.crop_left, picture.crop_right, picture.crop_top, picture.crop_bottom)):
+        return None
+    if picture.width * picture.height < min_coverage * slide_width * slide_height:
+        return None
+
+    for shape in text_shapes:
+        if shape.text_frame.text.strip() and _shapes_overlap(shape, picture):
+            return None
+    return picture
+
+
+def remove_logo_and_extract_heading(image_path, save_main_path=None, save_heading_path=None, top_px=116, reference_height=None):
+    """
+    Split a rendered slide into its body and its heading strip.
+
+    Args:
+        image_path (str | bytes | Image.Image): Rendered slide
+        save_main_path (str): Also write the body crop here
+        save_heading_path (str): Also write the heading crop here
+        top_px (int): Height of the heading strip
+        reference_height (int): Slide height top_px is measured on
+
+    Returns:
+        Image.Image: Body crop
+        Image.Image: Heading crop
+    """
+    if isinstance(image_path, (bytes, bytearray, memoryview)):
+        image_path = io.BytesIO(image_path)
+    image = image_path if isinstance(image_path, Image.Image) else Image.open(image_path)
     width, height = image.size
 
+    # top_px is measured on a reference_height tall export; scale it to this render
+    if reference_height:
+        top_px = round(top_px * height / reference_height)
+
     # Crop top and bottom
     cropped_main = image.crop((0, top_px, width, height))
-    heading_crop = image.crop((0, 0, int(width * 0.73), top_px))
-    
-    if not save_main_path:
-        save_main_path = image_path
+    heading_crop = image.crop((0, 0, int(width * HEADING_WIDTH_RATIO), top_px))
 
-    if not save_heading_path:
-        base, ext = os.path.splitext(image_path)
-        save_heading_path = f"{base}_heading{ext}"
+    if save_main_path:
+        cropped_main.save(save_main_path)
+    if save_heading_path:
+        heading_crop.save(save_heading_path)
 
-    cropped_main.save(save_main_path)
-    heading_crop.save(save_heading_path)
-        
-    return save_main_path, save_heading_path
+    return cropped_main, heading_crop
 
 def insert_paragraph_after(paragraph, text="", style=None):
     new_p = OxmlElement("w:p")
@@ -63,24 +187,36 @@ def insert_paragraph_after(paragraph, text="", style=None):
         new_para.style = style
     return new_para
 
+@functools.lru_cache(maxsize=None)
+def get_heading_font(size=36):
+    """
+    Load the heading overlay font once per process.
+
+    Returns:
+        ImageFont: Arial, or Pillow's default font when it is not installed
+    """
+    # Set font (fallback to default if custom font not available)
+    try:
+        return ImageFont.truetype("arial.ttf", size=size)
+    except OSError:
+        return ImageFont.load_default()
+
+
 def overlay_heading_on_image(image_path, save_path):
     # Load image
     img = Image.open(image_path).convert("RGB")
 
     # Extract text using OCR
-    extracted_text = pytesseract.image_to_string(img).strip()
+    extracted_text = ocr_image(img)
 
     # Initialize drawing context
     draw = ImageDraw.Draw(img)
 
-    # Set font (fallback to default if custom font not available)
-    try:
-        font = ImageFont.truetype("arial.ttf", size=36)
-    except:
-        font = ImageFont.load_default()
+    font = get_heading_font()
 
     # Draw text at the top center
-    text_width, text_height = draw.textsize(extracted_text, font=font)
+    left, top, right, bottom = draw.textbbox((0, 0), extracted_text, font=font)
+    text_width, text_height = right - left, bottom - top
     img_width, _ = img.size
     text_x = (img_width - text_width) // 2
     draw.text((text_x, 10), extracted_text, fill="black", font=font)
@@ -90,14 +226,10 @@ def overlay_heading_on_image(image_path, save_path):
     return save_path, extracted_text
 
 
-def insert_slide_content_at_placeholder(template_path, output_path, placeholder, headings_dict, image_dict):
-    doc = Document(template_path)
-    for i, para in enumerate(doc.paragraphs):
-        if placeholder in para.text:
-            # Store ref to placeholder
-            placeholder_para = para
-            break
-    else:
+def insert_slide_content_at_placeholder(template_path, output_path, placeholder, headings_dict, image_dict, progress=None):
+    doc = open_docx(template_path)
+    placeholder_para = find_placeholder(doc, placeholder)
+    if placeholder_para is None:
         raise ValueError(f"Placeholder '{placeholder}' not found in document.")
 
     # Remove placeholder text from that paragraph
@@ -110,6 +242,10 @@ def insert_slide_content_at_placeholder(template_path, output_path, placeholder,
     for slide_key in sorted(headings_dict.keys(), key=lambda x: int(x.split('_')[-1])):
         heading_text = headings_dict[slide_key]
         image_path = image_dict.get(slide_key)
+        # Slides taken from an embedded picture carry the original image bytes;
+        # only images wider than the manual needs are downscaled and re-encoded
+        if image_path:
+            image_path = fit_image_for_docx(image_path)
 
         # Heading
         current_para = insert_paragraph_after(current_para)
@@ -124,261 +260,247 @@ def insert_slide_content_at_placeholder(template_path, output_path, placeholder,
             run.add_picture(image_path, width=Inches(6))
             new_p.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
             current_para = new_p
+            if progress is not None:
+                progress.update(bytes_written=image_nbytes(image_path))
 
         # Page break
         current_para = insert_paragraph_after(current_para)
         run = current_para.add_run()
         run.add_break()  # page break
 
-    doc.save(output_path)
-    print(f"✅ Manual saved at: {output_path}")
+    if save_docx(doc, output_path):
+        print(f"✅ Manual saved at: {output_path}")
 
 
-def extract_DAP_text_and_images(pptx_path, output_dir):
+def extract_DAP_text_and_images(pptx_path, output_dir, progress=None, dedup=None):
     """
     Process and analyze all uploaded documents and extract text and images from a PowerPoint file.
     
     Args:
-        pptx_path (str): Path to PowerPoint file
+        pptx_path (str | bytes): Path to PowerPoint file, or the uploaded bytes
         output_dir (str): Directory to save outputs
+        progress (StageProgress): Told how many slides there are and how many are resolved
+        dedup (DedupIndex): Index shared with the job's other sections; rendered
+            slides that duplicate an earlier one reuse its image and OCR'd heading
 
     Returns:
-        dict: Analysis results for each document
+        dict: slide_key -> heading text
+        dict: slide_key -> encoded slide image
+        dict: Number of slides placed from an embedded picture ("picture"),
+            slides served from the render cache ("cached"), slides that were
+            rendered ("rendered") and slides whose heading had to be OCR'd ("ocr")
     """
-    global slide_image_map, slide_headings_text
-    
-    
-    # Load PowerPoint presentation
-    prs = Presentation(pptx_path)
-    os.makedirs(output_dir, exist_ok=True)
+    # Load PowerPoint presentation; python-pptx is only imported by jobs with slide decks
+    from pptx import Presentation
 
-    # Step 1: Export slide images
-    export_img_dir = os.path.join(output_dir, "slides_img")
-    os.makedirs(export_img_dir, exist_ok=True)
-    export_slides_as_images(pptx_path, export_img_dir)
+    prs = Presentation(open_source(pptx_path))
 
-    # Step 2: Process each slide image (remove logo, extract heading area)
+    # Step 1: Resolve headings from slide text and take single-picture slides
+    # straight from the deck; only the rest get rendered
     slide_image_map = {}
     slide_heading_map = {}
-
-    filenames = [
-    f for f in os.listdir(export_img_dir)
-    if re.search(r'\d+', os.path.splitext(f)[0].split("_")[-1])
-    ]
-    filenames.sort(key=lambda x: int(re.search(r'\d+', os.path.splitext(x)[0].split("_")[-1]).group()))
-
-
-    for filename in filenames[1:-1]:
-        img_path = os.path.join(export_img_dir, filename)
-        slide_no = os.path.splitext(filename)[0].split("_")[-1]
-        slide_no = re.search(r'\d+', slide_no).group()
-        
-        cropped_heading_img_path = os.path.join(output_dir, "Heading_img")
-        cropped_img_path = os.path.join(output_dir, "Cropped_img")
-        os.makedirs(cropped_heading_img_path, exist_ok=True)
-        os.makedirs(cropped_img_path, exist_ok=True)
-        
-        # Create paths for cropped images
-        cropped_main_path = os.path.join(cropped_img_path, f"cropped_slide_{slide_no}.png")
-        heading_img_path = os.path.join(cropped_heading_img_path, f"heading_slide_{slide_no}.png")
-        
-        #print(f"Processing {img_path}...")
-        main_img_path, heading_img_path = remove_logo_and_extract_heading(
-            img_path,
-            save_main_path=cropped_main_path,
-            save_heading_path=heading_img_path
+    slide_headings_text = {}
+    render_slides = []
+    cached_slides = 0
+
+    picture_slides = 0
+
+    # Rendered crops and OCR results are cached by slide content, render settings,
+    # crop and the encoding the body crop is stored with
+    rasterizer = get_rasterizer()
+    body_width = target_pixel_width()
+    render_settings = (rasterizer.name, rasterizer.dpi, HEADING_TOP_PX, HEADING_REFERENCE_HEIGHT, HEADING_WIDTH_RATIO)
+    cache_keys = {}
+
+    # The first and last slides are the title and closing slides
+    for slide_no in range(2, len(prs.slides)):
+        slide = prs.slides[slide_no - 1]
+        slide_key = f"slide_{slide_no}"
+
+        picture = get_single_picture(slide, prs.slide_width, prs.slide_height)
+        if picture is not None:
+            slide_image_map[slide_key] = picture.image.blob
+            picture_slides += 1
+
+        heading = get_slide_heading(slide, prs.slide_height)
+        if heading:
+            slide_headings_text[slide_key] = heading
+
+        # Render when the body needs pixels or the heading has to be OCR'd
+        if picture is not None and heading:
+            continue
+
+        slide_hash = slide_content_hash(slide)
+        body_key = make_key(slide_hash, "slide_body", *render_settings, body_width, JPEG_QUALITY)
+        heading_key = make_key(slide_hash, "heading_ocr", *render_settings)
+        cache_keys[slide_key] = (body_key, heading_key)
+
+        if slide_key not in slide_image_map:
+            cached = get_file(body_key)
+            if cached:
+                try:
+                    with open(cached, "rb") as f:
+                        slide_image_map[slide_key] = f.read()
+                except OSError:
+                    # Evicted by another process since the lookup
+                    pass
+        if slide_key not in slide_headings_text:
+            cached = get_text(heading_key)
+            if cached is not None:
+                slide_headings_text[slide_key] = cached
+
+        if slide_key in slide_image_map and slide_key in slide_headings_text:
+            cached_slides += 1
+        else:
+            render_slides.append(slide_no)
+
+    slide_stats = {
+        "picture": picture_slides,
+        "cached": cached_slides,
+        "rendered": len(render_slides),
+        "ocr": len(render_slides) - len([n for n in render_slides if f"slide_{n}" in slide_headings_text]),
+    }
+    print(
+        f"🖼️ {slide_stats['picture']} slide(s) taken from embedded pictures, {slide_stats['cached']} from cache, "
+        f"{slide_stats['rendered']} slide(s) rendered, {slide_stats['ocr']} heading(s) need OCR"
+    )
+    # A slide is done once both its image and its heading are known
+    slide_count = max(len(prs.slides) - 2, 0)
+    if progress is not None:
+        progress.update(done=slide_count - len(render_slides), total=slide_count, unit="slides")
+
+    if dedup is None:
+        dedup = DedupIndex()
+
+    # Step 2: Render the remaining slides to in-memory PNGs
+    # Rasterizers read a file, so an in-memory deck is only written out when slides must be rendered
+    rendered_images = {}
+    if render_slides:
+        with source_path(pptx_path, ".pptx") as path:
+            rendered_images = rasterizer.render_images(os.path.abspath(path), render_slides)
+
+    if SAVE_DEBUG_ARTIFACTS:
+        os.makedirs(output_dir, exist_ok=True)
+        for subdir in ("slides_img", "Cropped_img", "Heading_img"):
+            os.makedirs(os.path.join(output_dir, subdir), exist_ok=True)
+
+    # A slide repeated in this deck or an earlier section reuses the encoded body
+    # of the first; renders are compared by their PNG bytes, decoded only when new
+    body_batch = dedup.match("slide_body", {
+        f"slide_{slide_no}": png for slide_no, png in rendered_images.items()
+        if f"slide_{slide_no}" not in slide_image_map
+    })
+    encoded_bodies = {}
+
+    # Step 3: Split each rendered slide into body and heading strip. The body is
+    # encoded once for the manual; the heading goes to OCR as a decoded image.
+    for slide_no, png in rendered_images.items():
+        save_main_path = save_heading_path = None
+        if SAVE_DEBUG_ARTIFACTS:
+            with open(os.path.join(output_dir, "slides_img", f"Slide{slide_no}.png"), "wb") as f:
+                f.write(png)
+            save_main_path = os.path.join(output_dir, "Cropped_img", f"cropped_slide_{slide_no}.png")
+            save_heading_path = os.path.join(output_dir, "Heading_img", f"heading_slide_{slide_no}.png")
+
+        main_img, heading_img = remove_logo_and_extract_heading(
+            png,
+            save_main_path=save_main_path,
+            save_heading_path=save_heading_path,
+            top_px=HEADING_TOP_PX,
+            reference_height=HEADING_REFERENCE_HEIGHT
         )
 
-        slide_key = f"slide_{int(slide_no)}"
-        slide_image_map[slide_key] = main_img_path
-        slide_heading_map[slide_key] = heading_img_path
-
-    # Step 3: Extract text from slides
-    all_text = []
-    for i, slide in enumerate(prs.slides):
-        slide_text = []
-        for shape in slide.shapes:
-            if hasattr(shape, "text"):
-                text = shape.text.strip()
-                if text:
-                    slide_text.append(text)
+        slide_key = f"slide_{slide_no}"
+        if slide_key in body_batch.unique:
+            encoded_bodies[slide_key] = encode_for_docx(main_img, body_width)
+        if slide_key not in slide_headings_text:
+            # Grayscale keeps the crop small when it is shipped to an OCR worker
+            slide_heading_map[slide_key] = heading_img.convert("L")
+        elif progress is not None:
+            progress.update(advance=1)
 
-        combined_text = "\n".join(slide_text)
-        all_text.append(f"Slide {i+1}:\n{combined_text}")
-
-    full_text = "\n\n".join(all_text)
-    
-    # Step 4: Extract headings from images
-    slide_headings_text = {}
-    
-    for slide_key, heading_img_path in slide_heading_map.items():
-        img = Image.open(heading_img_path)
-        text = pytesseract.image_to_string(img).strip()
-        slide_headings_text[slide_key] = text
+    # Duplicates get the bytes of their first copy, so the manual stores the image once
+    for slide_key, image in body_batch.resolve(encoded_bodies).items():
+        slide_image_map[slide_key] = image
+        put_file(cache_keys[slide_key][0], image)
 
-    # Step 4: Extract metadata with GPT
-    
+    # Step 4: OCR the headings that only exist as pixels, each distinct strip once
+    heading_batch = dedup.match("slide_heading", slide_heading_map)
+    ocr_results = heading_batch.resolve(ocr_headings(heading_batch.unique))
+    for slide_key, text in ocr_results.items():
+        put_text(cache_keys[slide_key][1], text)
+    slide_headings_text.update(ocr_results)
+    if progress is not None:
+        progress.update(done=slide_count)
 
-    # best_img = slide_image_map.get(info["best_image_slide"])
-    # if best_img and os.path.exists(best_img):
-    #     doc.add_paragraph("Machine Overview:")
-    #     doc.add_picture(best_img, width=Inches(5))
+    enforce_size_limit()
 
-    # # Step 7: Add slide content with headings and images
-    # doc.add_page_break()
-    #
+    return slide_headings_text, slide_image_map, slide_stats
 
-def process_dap_to_docx(folder_path, template_path):
-    """
-    Extracts headings and images from a DAP PowerPoint and inserts them into a DOCX template.
 
-    Args:
-        folder_path (str): Path to the folder containing the DAP PowerPoint file.
-        template_path (str): Path to the base DOCX template.
-        output_docx_path (str): Path to save the final generated manual.
-        placeholder (str): Placeholder text in the DOCX to be replaced.
+def extract_pptx_section(job, section, progress=None):
     """
-    pptx_files = glob.glob(os.path.join(folder_path, "*.pptx"))
-    if len(pptx_files) == 0:
-        print("⚠️ No PPTX file found in DAP folder. Aborting.")
-        return
-    elif len(pptx_files) > 1:
-        print("⚠️ Multiple PPTX files found in DAP folder. Aborting.")
-        return
+    Extract the slide headings and images of one PowerPoint section.
 
-    pptx_path = pptx_files[0]
-    # print(f"📂 Found PPTX file: {pptx_path}")
-    
-    output_dir = os.path.abspath("dap_img_extracted")
-    placeholder="{{MACHINE_OVERVIEW_DAP}}"
-    # Step 1: Extract slide data (images + headings via OCR)
-    print("Extracting DAP slide data...")
-    extract_DAP_text_and_images(pptx_path, output_dir)
-    
-    print("Inserting DAP slide data into DOCX...")
-    # Step 2: Insert extracted data into DOCX
-    insert_slide_content_at_placeholder(
-        template_path=template_path,
-        output_path=template_path,
-        placeholder=placeholder,
-        headings_dict=slide_headings_text,
-        image_dict=slide_image_map
-    )
-
-def process_sop_to_docx(folder_path, template_path):
-    """
-    Extracts headings and images from a SOP PowerPoint and inserts them into a DOCX template.
+    Runs as an extraction stage alongside the other sections.
 
     Args:
-        pptx_path (str): Path to the SOP PowerPoint file.
-        template_path (str): Path to the base DOCX template.
-        output_docx_path (str): Path to save the final generated manual.
-        placeholder (str): Placeholder text in the DOCX to be replaced.
-    """
-    pptx_files = glob.glob(os.path.join(folder_path, "*.pptx"))
-    if len(pptx_files) == 0:
-        print("⚠️ No PPTX file found in SOP folder. Aborting.")
-        return
-    elif len(pptx_files) > 1:
-        print("⚠️ Multiple PPTX files found in SOP folder. Aborting.")
-        return
+        job (Job): Job whose upload is processed; the slides are kept on job.extracted
+        section (str): Upload category, e.g. "DAP"
+        progress (StageProgress): Told how many slides there are and how many are resolved
 
-    pptx_path = pptx_files[0]
-    # print(f"📂 Found PPTX file: {pptx_path}")
-    
-    output_dir = os.path.abspath("sop_img_extracted")
-    placeholder="{{Upload_SOP_here}}"
-    
-    # Step 1: Extract slide data (images + headings via OCR)
-    print("Extracting SOP slide data...")
-    extract_DAP_text_and_images(pptx_path, output_dir)
-    
-    print("Inserting SOP slide data into DOCX...")
-    # Step 2: Insert extracted data into DOCX
-    insert_slide_content_at_placeholder(
-        template_path=template_path,
-        output_path=template_path,
-        placeholder=placeholder,
-        headings_dict=slide_headings_text,
-        image_dict=slide_image_map
-    )
-
-def process_hmi_to_docx(folder_path, template_path):
-    """
-    Extracts headings and images from a HMI PowerPoint and inserts them into a DOCX template.
-
-    Args:
-        folder_path (str): Path to the folder containing the HMI PowerPoint file.
-        template_path (str): Path to the base DOCX template.
-        output_docx_path (str): Path to save the final generated manual.
-        placeholder (str): Placeholder text in the DOCX to be replaced.
+    Returns:
+        tuple: (slide_key -> heading, slide_key -> image), or None when the
+            section has no PowerPoint file
     """
-    pptx_files = glob.glob(os.path.join(folder_path, "*.pptx"))
+    pptx_files = job.input_files(section, (".pptx",))
     if len(pptx_files) == 0:
-        print("⚠️ No PPTX file found in HMI folder. Aborting.")
-        return
+        print(f"⚠️ No PPTX file found in {section} folder. Aborting.")
+        slides = None
     elif len(pptx_files) > 1:
-        print("⚠️ Multiple PPTX files found in HMI folder. Aborting.")
-        return
+        print(f"⚠️ Multiple PPTX files found in {section} folder. Aborting.")
+        slides = None
+    else:
+        pptx_path = pptx_files[0]
+        output_dir = job.work_dir(f"{section.lower()}_img_extracted", create=False)
 
-    pptx_path = pptx_files[0]
-    # print(f"📂 Found PPTX file: {pptx_path}")
-    
-    output_dir = os.path.abspath("hmi_img_extracted")
-    placeholder="{{Upload_HMI_here}}"
+        # Images + headings (slide text first, OCR for the rest)
+        print(f"Extracting {section} slide data...")
+        slide_headings_text, slide_image_map, _ = extract_DAP_text_and_images(pptx_path, output_dir, progress, job.dedup)
+        slides = (slide_headings_text, slide_image_map)
 
-    # Step 1: Extract slide data (images + headings via OCR)
-    print("Extracting HMI slide data...")
-    extract_DAP_text_and_images(pptx_path, output_dir)
-    
-    print("Inserting HMI slide data into DOCX...")
-    # Step 2: Insert extracted data into DOCX
-    insert_slide_content_at_placeholder(
-        template_path=template_path,
-        output_path=template_path,
-        placeholder=placeholder,
-        headings_dict=slide_headings_text,
-        image_dict=slide_image_map
-    )
+    job.extracted[section] = slides
+    return slides
 
-def process_scada_to_docx(folder_path, template_path):
+
+def insert_slide_section(job, template_path, section, placeholder, progress=None):
     """
-    Extracts headings and images from a SCADA PowerPoint and inserts them into a DOCX template.
+    Insert the headings and images of one PowerPoint section into a DOCX template.
+
+    Slides extracted by extract_pptx_section are reused; otherwise they are
+    extracted here.
 
     Args:
-        folder_path (str): Path to the folder containing the SCADA PowerPoint file.
-        template_path (str): Path to the base DOCX template.
-        output_docx_path (str): Path to save the final generated manual.
-        placeholder (str): Placeholder text in the DOCX to be replaced.
+        job (Job): Job whose upload is processed
+        template_path (str | Document): Path to the base DOCX template or an open Document
+        section (str): Upload category, e.g. "SOP"
+        placeholder (str): Placeholder the slides replace
+        progress (StageProgress): Told the bytes inserted
     """
-    pptx_files = glob.glob(os.path.join(folder_path, "*.pptx"))
-    if len(pptx_files) == 0:
-        print("⚠️ No PPTX file found in SCADA folder. Aborting.")
-        return
-    elif len(pptx_files) > 1:
-        print("⚠️ Multiple PPTX files found in SCADA folder. Aborting.")
+    if section in job.extracted:
+        slides = job.extracted[section]
+    else:
+        slides = extract_pptx_section(job, section)
+    if slides is None:
         return
 
-    pptx_path = pptx_files[0]
-    # print(f"📂 Found PPTX file: {pptx_path}")
-    
-    output_dir = os.path.abspath("scada_img_extracted")
-    placeholder="{{Upload_scada_screens_here}}"
-
-    # Step 1: Extract slide data (images + headings via OCR)
-    print("Extracting SCADA slide data...")
-    extract_DAP_text_and_images(pptx_path, output_dir)
-    
-    print("Inserting SCADA slide data into DOCX...")
-    # Step 2: Insert extracted data into DOCX
+    slide_headings_text, slide_image_map = slides
+    print(f"Inserting {section} slide data into DOCX...")
     insert_slide_content_at_placeholder(
         template_path=template_path,
         output_path=template_path,
         placeholder=placeholder,
         headings_dict=slide_headings_text,
-        image_dict=slide_image_map
+        image_dict=slide_image_map,
+        progress=progress
     )
-
-
-
-
@@ -0,0 +1,153 @@
+import threading
+import time
+
+
+class Progress:
+    """
+    Emits structured progress events for one manual generation.
+
+    Stages may run concurrently; each gets its own StageProgress handle. Every
+    event is a dict passed to the callback:
+
+        stage, stage_index, stage_count   which stage changed (index in start order)
+        done, total, unit                 items finished in the stage ("slides", "pages", ...)
+        bytes                             bytes written into the manual by the stage so far
+        elapsed_s, rate                   seconds in the stage and items per second
+        fraction                          share of the whole generation done, 0 to 1
+        finished                          True on the last event of a stage
+
+    Without a callback, progress is tracked but nothing is emitted.
+    """
+
+    def __init__(self, callback=None, stage_count=None):
+        self.callback = callback
+        self.stage_count = stage_count
+        self._stages = []
+        self._lock = threading.RLock()
+
+    def start_stage(self, name, total=None, unit="items"):
+        """
+        Begin a stage.
+
+        Args:
+            name (str): Stage name shown to the user
+            total (int): Items the stage will process, if known up front
+            unit (str): What an item is ("slides", "pages", "photos")
+
+        Returns:
+            StageProgress: Handle the stage reports its work through
+        """
+        with self._lock:
+            stage = StageProgress(self, name, len(self._stages) + 1, total, unit)
+            self._stages.append(stage)
+        self._emit(stage)
+        return stage
+
+    def fraction(self):
+        """
+        Returns:
+            float: Share of the whole generation that is done, from 0 to 1
+        """
+        with self._lock:
+            stages = list(self._stages)
+        count = self.stage_count or len(stages)
+        if not count:
+            return 0.0
+        return min(sum(stage.fraction() for stage in stages) / count, 1.0)
+
+    def _emit(self, stage, finished=False):
+        if self.callback is None:
+            return
+        # Callbacks may write to a shared store; never call them from two stages at once
+        with self._lock:
+            elapsed = time.perf_counter() - stage.start
+            self.callback({
+                "stage": stage.name,
+                "stage_index": stage.index,
+                "stage_count": self.stage_count,
+                "done": stage.done,
+                "total": stage.total,
+                "unit": stage.unit,
+                "bytes": stage.bytes,
+                "elapsed_s": elapsed,
+                "rate": stage.done / elapsed if elapsed > 0 else 0.0,
+                "fraction": self.fraction(),
+                "finished": finished,
+            })
+
+
+class StageProgress:
+    """Progress of one running stage (see Progress.start_stage)."""
+
+    def __init__(self, progress, name, index, total=None, unit="items"):
+        self.progress = progress
+        self.name = name
+        self.index = index
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.bytes = 0
+        self.finished = False
+        self.start = time.perf_counter()
+
+    def update(self, done=None, total=None, unit=None, advance=0, bytes_written=0):
+        """
+        Report work within the stage.
+
+        Args:
+            done (int): Items finished so far (absolute)
+            total (int): Items the stage will process, once known
+            unit (str): What an item is
+            advance (int): Items finished since the last update (relative)
+            bytes_written (int): Bytes added to the manual since the last update
+        """
+        if total is not None:
+            self.total = total
+        if unit is not None:
+            self.unit = unit
+        if done is not None:
+            self.done = done
+        self.done += advance
+        self.bytes += bytes_written
+        self.progress._emit(self)
+
+    def end(self):
+        """Finish the stage."""
+        if self.total is not None:
+            self.done = max(self.done, self.total)
+        self.finished = True
+        self.progress._emit(self, finished=True)
+
+    def fraction(self):
+        """
+        Returns:
+            float: Share of this stage that is done, from 0 to 1
+        """
+        if self.finished:
+            return 1.0
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+
+def format_progress(event):
+    """
+    Describe a progress event in one line.
+
+    Returns:
+        str: e.g. "[5/14] Extracting DAP slides... 12/40 slides (3.1 slides/s)"
+    """
+    text = f"[{event['stage_index']}/{event['stage_count'] or '?'}] {event['stage']}"
+    if event["done"] or event["total"]:
+        text += f" {event['done']}/{event['total'] if event['total'] is not None else '?'} {event['unit']}"
+        if event["rate"]:
+            text += f" ({event['rate']:.1f} {event['unit']}/s)"
+    if event["bytes"] >= 1024 * 1024:
+        text += f", {event['bytes'] / (1024 * 1024):.1f} MB"
+    elif event["bytes"]:
+        text += f", {event['bytes'] / 1024:.0f} KB"
+    return text
+
+
+def print_progress(event):
+    """Progress callback for the CLI and logs: prints each finished stage with its throughput."""
+    if event["finished"]:
+        print(f"⏱️ {format_progress(event)} in {event['elapsed_s']:.1f}s")
@@ -1,6 +1,5 @@
-from docx import Document
-from docx.shared import Pt
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from placeholder_index import find_placeholder
+from utils import open_docx, save_docx
 
 def insert_project_details(doc, project_info):
     if doc is None or not hasattr(doc, 'paragraphs'):
@@ -92,28 +91,44 @@ def insert_electrical_specifications(doc, electrical_specs):
 def extract_project_info(txt_path, info):
     """
     Extracts project_name, customer, and project_no from a TXT file.
+
+    Args:
+        txt_path (str | bytes): Path to Project_info.txt, or its contents
+            (see Job.project_info_source)
+        info (dict): Keys to look for; filled in place
+
+    Returns:
+        dict: info with the values found
     """
     
-    with open(txt_path, "r") as file:
-        for line in file:
-            for key in info.keys():
-                if key in line:
-                    # Split by '=' and strip trailing commas/spaces
-                    value = line.split("=")[1].strip().rstrip(",")
-                    info[key] = value
+    if isinstance(txt_path, (bytes, bytearray)):
+        lines = txt_path.decode("utf-8").splitlines()
+    else:
+        with open(txt_path, "r") as file:
+            lines = file.readlines()
+    for line in lines:
+        for key in info.keys():
+            if key in line:
+                # Split by '=' and strip trailing commas/spaces
+                value = line.split("=")[1].strip().rstrip(",")
+                info[key] = value
     return info
 
 
-def insert_project_info(docx_path):
+def insert_project_info(docx_path, job):
     """
     Inserts the extracted info into a DOCX file at the placeholder location.
+
+    Args:
+        docx_path (str | Document): Path to the .docx file or an open Document
+        job (Job): Job whose Project_info.txt is read
     """
-    doc = Document(docx_path)
+    doc = open_docx(docx_path)
     output_path = docx_path
     placeholder = "{{Project Details}}"
     # Initialize info dictionary
     info = {"project_name": "", "customer": "", "project_no": ""}
-    project_info = extract_project_info(txt_path="uploads/Project_info/Project_info.txt", info=info)
+    project_info = extract_project_info(txt_path=job.project_info_source, info=info)
 
     # Create content block
     content = (
@@ -121,49 +136,59 @@ def insert_project_info(docx_path):
     f"Customer = {project_info['customer']}, \n"
     f"Project No = {project_info['project_no']}"
 )
-    for para in doc.paragraphs:
-        if placeholder in para.text:
-            para.text = para.text.replace(placeholder, "")
-            run = para.add_run(content)
-            break
+    para = find_placeholder(doc, placeholder)
+    if para is not None:
+        para.text = para.text.replace(placeholder, "")
+        run = para.add_run(content)
 
-    doc.save(output_path)
-    print(f"✅ Updated project info in DOCX saved at: {output_path}")
+    if save_docx(doc, output_path):
+        print(f"✅ Updated project info in DOCX saved at: {output_path}")
+    else:
+        print("✅ Updated project info in DOCX.")
     
     return doc, True
 
-def insert_machine_specifications(docx_path):
+def insert_machine_specifications(docx_path, job):
     """
     Inserts the extracted info into a DOCX file at the placeholder location.
+
+    Args:
+        docx_path (str | Document): Path to the .docx file or an open Document
+        job (Job): Job whose Project_info.txt is read
     """
-    doc = Document(docx_path)
+    doc = open_docx(docx_path)
     info = {"machine_specs": ""}
     output_path = docx_path
     placeholder = "{{Machine_Specifications}}"
-    project_info = extract_project_info(txt_path="uploads/Project_info/Project_info.txt", info=info)
+    project_info = extract_project_info(txt_path=job.project_info_source, info=info)
     
     # Create content block
     content = f"{project_info['machine_specs']}"
-    for para in doc.paragraphs:
-        if placeholder in para.text:
-            para.text = para.text.replace(placeholder, "")
-            run = para.add_run(content)
-            break
+    para = find_placeholder(doc, placeholder)
+    if para is not None:
+        para.text = para.text.replace(placeholder, "")
+        run = para.add_run(content)
 
-    doc.save(output_path)
-    print(f"✅ Updated machine specs in DOCX saved at: {output_path}")
+    if save_docx(doc, output_path):
+        print(f"✅ Updated machine specs in DOCX saved at: {output_path}")
+    else:
+        print("✅ Updated machine specs in DOCX.")
     return doc, True
 
-def insert_electrical_specifications(docx_path):
+def insert_electrical_specifications(docx_path, job):
     """
     Inserts the extracted info into a DOCX file at the placeholder location.
+
+    Args:
+        docx_path (str | Document): Path to the .docx file or an open Document
+        job (Job): Job whose Project_info.txt is read
     """
-    doc = Document(docx_path)
+    doc = open_docx(docx_path)
     info = {"Voltage": "", "Power": "", "Current": "", "Frequency": ""}
     output_path = docx_path
     
     placeholder = "{{Electrical_Specifications}}"
-    project_info = extract_project_info(txt_path="uploads/Project_info/Project_info.txt", info=info)
+    project_info = extract_project_info(txt_path=job.project_info_source, info=info)
     
     # Create content block
     content = (
@@ -172,14 +197,15 @@ def insert_electrical_specifications(docx_path):
         f"Current:{project_info['Current']},   "
         f"Frequency:{project_info['Frequency']}"
     )
-    for para in doc.paragraphs:
-        if placeholder in para.text:
-            para.text = para.text.replace(placeholder, "")
-            run = para.add_run(content)
-            break
+    para = find_placeholder(doc, placeholder)
+    if para is not None:
+        para.text = para.text.replace(placeholder, "")
+        run = para.add_run(content)
 
-    doc.save(output_path)
-    print(f"✅ Updated electrical specs in DOCX saved at: {output_path}")
+    if save_docx(doc, output_path):
+        print(f"✅ Updated electrical specs in DOCX saved at: {output_path}")
+    else:
+        print("✅ Updated electrical specs in DOCX.")
     
     return doc, True
 
@@ -0,0 +1,250 @@
+import contextlib
+import hashlib
+import os
+import shutil
+import tempfile
+
+# Shared by every job and worker on the host, wherever they were started from
+CACHE_DIR = os.path.abspath(
+    os.environ.get("RENDER_CACHE_DIR")
+    or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "render_cache")
+)
+# Turn off to render and OCR everything again (nothing is read or stored)
+CACHE_ENABLED = os.environ.get("RENDER_CACHE", "1") != "0"
+CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_MB", 2048)) * 1024 * 1024
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextlib.contextmanager
+def _cache_lock(cache_dir):
+    """Exclusive lock across processes sharing the cache directory."""
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, ".lock"), "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def make_key(*parts):
+    """
+    Build a cache key from the things that determine an output.
+
+    Args:
+        *parts: Content hash, stage name, DPI, crop parameters, ...
+
+    Returns:
+        str: Hex digest
+    """
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+
+def _entry_path(key, ext, cache_dir):
+    return os.path.join(cache_dir, key[:2], f"{key}{ext}")
+
+
+def get_file(key, ext=".png", cache_dir=None):
+    """
+    Look up a cached file.
+
+    Args:
+        key (str): Cache key from make_key
+        ext (str): File extension the entry was stored with
+        cache_dir (str): Cache directory (RENDER_CACHE_DIR)
+
+    Returns:
+        str: Path to the cached file, or None on a miss or with the cache off
+    """
+    if not CACHE_ENABLED:
+        return None
+    path = _entry_path(key, ext, cache_dir or CACHE_DIR)
+    try:
+        # Touch on hit so eviction drops the least recently used entries first
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+
+def put_file(key, source, ext=".png", cache_dir=None):
+    """
+    Store a file in the cache.
+
+    The entry is written to a temporary file and renamed into place, so
+    concurrent readers never see a partial file.
+
+    Args:
+        key (str): Cache key from make_key
+        source (str | bytes): Path of the file to copy, or its contents
+        ext (str): File extension
+        cache_dir (str): Cache directory (RENDER_CACHE_DIR)
+
+    Returns:
+        str: Path to the cached file, or None with the cache off
+    """
+    if not CACHE_ENABLED:
+        return None
+    path = _entry_path(key, ext, cache_dir or CACHE_DIR)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                f.write(source)
+            else:
+                with open(source, "rb") as src:
+                    shutil.copyfileobj(src, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+    return path
+
+
+def get_text(key, cache_dir=None):
+    """
+    Look up a cached string (e.g. an OCR result).
+
+    Returns:
+        str: The cached text, or None on a miss
+    """
+    path = get_file(key, ".txt", cache_dir)
+    if path is None:
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        # Evicted by another process since the lookup
+        return None
+
+
+def put_text(key, text, cache_dir=None):
+    """
+    Store a string in the cache.
+
+    Returns:
+        str: Path to the cached file, or None with the cache off
+    """
+    return put_file(key, text.encode("utf-8"), ".txt", cache_dir)
+
+
+def enforce_size_limit(max_bytes=CACHE_MAX_BYTES, cache_dir=None):
+    """
+    Evict least recently used entries until the cache fits in max_bytes.
+
+    Args:
+        max_bytes (int): Size limit in bytes
+        cache_dir (str): Cache directory
+
+    Returns:
+        int: Number of entries evicted
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    with _cache_lock(cache_dir):
+        entries = []
+        total = 0
+        for shard in os.scandir(cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            with contextlib.suppress(OSError):
+                os.unlink(path)
+                total -= size
+                evicted += 1
+    return evicted
+
+
+def slide_content_hash(slide):
+    """
+    Hash everything that affects how a slide renders.
+
+    Covers the slide XML, its images and media, and its layout, master and
+    theme. Other slides and notes are left out, so editing one slide only
+    changes that slide's hash.
+
+    Args:
+        slide (Slide): python-pptx slide
+
+    Returns:
+        str: Hex digest
+    """
+    from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+    skipped = {RT.NOTES_SLIDE, RT.SLIDE, RT.SLIDE_LAYOUT}
+    digest = hashlib.sha256()
+    seen = set()
+    stack = [slide.part]
+    while stack:
+        part = stack.pop()
+        if part.partname in seen:
+            continue
+        seen.add(part.partname)
+        digest.update(str(part.partname).encode("utf-8"))
+        digest.update(part.blob)
+        for rel in part.rels.values():
+            if rel.is_external:
+                continue
+            # Only the slide's own layout; a master links to every layout
+            if rel.reltype in skipped and not (part is slide.part and rel.reltype == RT.SLIDE_LAYOUT):
+                continue
+            stack.append(rel.target_part)
+    return digest.hexdigest()
+
+
+def pdf_page_hash(pdf, page):
+    """
+    Hash everything that affects how a PDF page renders.
+
+    Covers the page geometry, its content streams and the images, fonts and
+    form XObjects it uses.
+
+    Args:
+        pdf (fitz.Document): Open document
+        page (fitz.Page): Page of that document
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(repr((tuple(page.rect), page.rotation)).encode("utf-8"))
+    digest.update(page.read_contents())
+
+    xrefs = {image[0] for image in page.get_images(full=True)}
+    xrefs.update(font[0] for font in page.get_fonts(full=True))
+    xrefs.update(xobject[0] for xobject in page.get_xobjects())
+    for xref in sorted(xrefs):
+        if xref <= 0:
+            continue
+        digest.update(pdf.xref_object(xref, compressed=True).encode("utf-8"))
+        if pdf.xref_is_stream(xref):
+            digest.update(pdf.xref_stream_raw(xref))
+    return digest.hexdigest()
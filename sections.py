@@ -0,0 +1,186 @@
+from alarm_tables import extract_alarms_section, insert_alarms_section
+from bom_tables import extract_bom_section, insert_bom_section
+from docx_merge import extract_docx_section, find_section_docx, insert_docx_section
+from Img_expraction import insert_section_photos, prepare_section_photos
+from pdf_doc_extractor import insert_pdf_section, prerender_pdf_section
+from pptx_data_processing import extract_pptx_section, insert_slide_section
+
+
+class SectionKind:
+    """
+    How one kind of upload (photos, slide decks, PDFs, documents, tables) is extracted and inserted.
+
+    Both callables take the Section as their second argument, so every section
+    of a kind shares them and only differs in its registry entry.
+    """
+
+    def __init__(self, extract, insert, unit, verb):
+        """
+        Args:
+            extract (callable): extract(job, section, progress) -> extracted content,
+                also kept on job.extracted[section.category]
+            insert (callable): insert(job, docx, section, progress)
+            unit (str): What the extraction's progress items are
+            verb (str): Extraction stage name, e.g. "Rendering" pages
+        """
+        self.extract = extract
+        self.insert = insert
+        self.unit = unit
+        self.verb = verb
+
+
+SECTION_KINDS = {
+    "photos": SectionKind(
+        extract=lambda job, section, progress: prepare_section_photos(
+            job, section.category, progress, **section.options),
+        insert=lambda job, docx, section, progress: insert_section_photos(
+            docx, job, section.category, section.placeholder, section.label, progress, **section.options),
+        unit="photos",
+        verb="Preparing",
+    ),
+    "slides": SectionKind(
+        extract=lambda job, section, progress: extract_pptx_section(job, section.category, progress),
+        insert=lambda job, docx, section, progress: insert_slide_section(
+            job, docx, section.category, section.placeholder, progress),
+        unit="slides",
+        verb="Extracting",
+    ),
+    "pdf": SectionKind(
+        extract=lambda job, section, progress: prerender_pdf_section(
+            job, section.category, section.label, progress, **section.options),
+        insert=lambda job, docx, section, progress: insert_pdf_section(
+            job, docx, section.category, section.label, section.placeholder, progress, **section.options),
+        unit="pages",
+        verb="Rendering",
+    ),
+    "alarms": SectionKind(
+        extract=lambda job, section, progress: extract_alarms_section(
+            job, section.category, section.label, progress, **section.options),
+        insert=lambda job, docx, section, progress: insert_alarms_section(
+            job, docx, section.category, section.label, section.placeholder, progress, **section.options),
+        unit="rows",
+        verb="Reading",
+    ),
+    "docx": SectionKind(
+        extract=lambda job, section, progress: extract_docx_section(job, section.category, section.label, progress),
+        insert=lambda job, docx, section, progress: insert_docx_section(
+            job, docx, section.category, section.label, section.placeholder, progress),
+        unit="elements",
+        verb="Reading",
+    ),
+    "table": SectionKind(
+        extract=lambda job, section, progress: extract_bom_section(job, section.category, section.label, progress),
+        insert=lambda job, docx, section, progress: insert_bom_section(
+            job, docx, section.category, section.label, section.placeholder, progress),
+        unit="rows",
+        verb="Reading",
+    ),
+}
+
+
+class Section:
+    """One upload category of the manual and where its content goes."""
+
+    def __init__(self, category, kind, placeholder, message, label=None, inserts=1, merge_docx=False, **options):
+        """
+        Args:
+            category (str): Upload category, e.g. "DAP"
+            kind (str): Key of SECTION_KINDS
+            placeholder (str): Template placeholder the content replaces
+            message (str): Status message printed when the section is inserted
+            label (str): Section name used in messages and scratch folders (category when None)
+            inserts (int): Times the placeholder occurs in the template; the
+                content is inserted at each occurrence
+            merge_docx (bool): Also accept a .docx upload, whose body is merged
+                into the manual instead (see docx_merge)
+            **options: Render options passed to the kind's extractor and inserter,
+                e.g. dpi=150 for a PDF or target_width=800 for photos
+        """
+        if kind not in SECTION_KINDS:
+            raise ValueError(f"Unknown section kind '{kind}', expected one of {', '.join(SECTION_KINDS)}")
+        self.category = category
+        self.kind = kind
+        self.placeholder = placeholder
+        self.message = message
+        self.label = label or category
+        self.inserts = inserts
+        self.merge_docx = merge_docx
+        self.options = options
+
+    @property
+    def unit(self):
+        return SECTION_KINDS[self.kind].unit
+
+    @property
+    def extraction_name(self):
+        """Name of the section's extraction stage, e.g. "Rendering Alarms pages..."."""
+        return f"{SECTION_KINDS[self.kind].verb} {self.label} {self.unit}..."
+
+    def extract(self, job, progress=None):
+        """Extract the section's content from the job's uploads (see SectionKind)."""
+        if self.merge_docx and find_section_docx(job, self.category) is not None:
+            return SECTION_KINDS["docx"].extract(job, self, progress)
+        return SECTION_KINDS[self.kind].extract(job, self, progress)
+
+    def insert(self, job, docx, progress=None):
+        """Insert the section's extracted content into the working document."""
+        if self.merge_docx and find_section_docx(job, self.category) is not None:
+            return SECTION_KINDS["docx"].insert(job, docx, self, progress)
+        return SECTION_KINDS[self.kind].insert(job, docx, self, progress)
+
+
+# Upload sections in the order they appear in the manual
+SECTIONS = [
+    Section("Machine_Photos", "photos", "{{Insert_Cover_Photo_Here}}", "Processing machine photos...", label="machine", inserts=2),
+    Section("Layout_Photos", "photos", "{{Upload_Machine_Layout_here}}", "Processing layout photos...", label="layout"),
+    Section("DAP", "slides", "{{MACHINE_OVERVIEW_DAP}}", "Processing DAP file..."),
+    Section("SOP", "slides", "{{Upload_SOP_here}}", "Processing SOP file...", merge_docx=True),
+    Section("HMI", "slides", "{{Upload_HMI_here}}", "Processing HMI file..."),
+    Section("SCADA", "slides", "{{Upload_scada_screens_here}}", "Processing SCADA file...", merge_docx=True),
+    Section("Alarms", "alarms", "{{Upload_alarms_doc_here}}", "Processing alarms file..."),
+    Section("E-PLAN_Drawing", "pdf", "{{Upload_Electrical_drawing_here}}", "Processing electrical circuit diagram...", label="EPLAN"),
+    Section("Pneumatic", "photos", "{{Upload_Pneumatic_Circuit_Here}}", "Processing pneumatic circuit diagram...", label="pneumatic", merge_docx=True),
+    Section("Laser_Doc", "docx", "{{Upload_other_docs_here}}", "Processing laser documentation...", label="laser"),
+    # Both BOMs go before the same placeholder, MBOM first
+    Section("MBOM", "table", "{{Upload_MBOM}}", "Processing MBOM file..."),
+    Section("EBOM", "table", "{{Upload_MBOM}}", "Processing EBOM file..."),
+]
+
+
+def register_section(section, after=None):
+    """
+    Add an upload section to the manual.
+
+    Args:
+        section (Section): Section to add
+        after (str): Category the section follows in the manual (appended when None)
+
+    Returns:
+        Section: The registered section
+    """
+    if any(existing.category == section.category for existing in SECTIONS):
+        raise ValueError(f"Section '{section.category}' is already registered")
+    index = len(SECTIONS)
+    if after is not None:
+        index = [existing.category for existing in SECTIONS].index(after) + 1
+    SECTIONS.insert(index, section)
+    return section
+
+
+def get_section(category):
+    """
+    Look up a registered section.
+
+    Args:
+        category (str): Upload category, e.g. "SOP"
+
+    Returns:
+        Section: The section
+
+    Raises:
+        KeyError: When no section is registered for the category
+    """
+    for section in SECTIONS:
+        if section.category == category:
+            return section
+    raise KeyError(f"No section registered for '{category}'")
@@ -0,0 +1,295 @@
+import math
+import os
+import queue
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pdf_renderer import submit_page_render
+
+# 96 dpi matches PowerPoint's default PNG export (1280x720 for a 16:9 slide)
+DEFAULT_DPI = int(os.environ.get("SLIDE_RENDER_DPI", 96))
+DEFAULT_WORKERS = int(os.environ.get("SLIDE_RENDER_WORKERS", 4))
+SLIDE_NAME_FORMAT = "Slide{}.png"
+
+# LibreOffice conversions of one deck that run at the same time, each on a slide range
+CONVERT_WORKERS = int(os.environ.get("SLIDE_CONVERT_WORKERS", DEFAULT_WORKERS))
+# Fewest slides worth a conversion of their own; soffice takes about a second to start
+SLIDES_PER_CONVERSION = int(os.environ.get("SLIDE_CONVERT_MIN_SLIDES", 25))
+
+
+class SlideRasterizer:
+    """
+    Base class for slide rasterization backends.
+
+    A backend renders slides of a presentation to output_dir/Slide{n}.png.
+    """
+
+    name = None
+
+    def __init__(self, dpi=None, workers=None):
+        self.dpi = dpi or DEFAULT_DPI
+        self.workers = workers or DEFAULT_WORKERS
+
+    def render(self, pptx_path, output_dir, slides=None):
+        """
+        Render the slides of a presentation to PNG.
+
+        Args:
+            pptx_path (str): Path to the PowerPoint file
+            output_dir (str): Directory to write Slide{n}.png files to
+            slides (list): 1-based slide numbers to render (all slides when None)
+
+        Returns:
+            list: Image paths in slide order
+        """
+        raise NotImplementedError
+
+    def render_images(self, pptx_path, slides=None):
+        """
+        Render the slides of a presentation to PNG bytes without keeping any files.
+
+        Backends that can only export to disk render to a temporary directory.
+
+        Args:
+            pptx_path (str): Path to the PowerPoint file
+            slides (list): 1-based slide numbers to render (all slides when None)
+
+        Returns:
+            dict: 1-based slide number -> PNG bytes
+        """
+        images = {}
+        with tempfile.TemporaryDirectory() as output_dir:
+            for path in self.render(pptx_path, output_dir, slides=slides):
+                slide_no = int(re.search(r"\d+", os.path.basename(path)).group())
+                with open(path, "rb") as f:
+                    images[slide_no] = f.read()
+        return images
+
+
+class PowerPointRasterizer(SlideRasterizer):
+    """Exports slides through a desktop PowerPoint instance over COM (Windows only)."""
+
+    name = "powerpoint"
+
+    def render(self, pptx_path, output_dir, slides=None):
+        import win32com.client
+
+        pptx_path = os.path.abspath(pptx_path)
+        output_dir = os.path.abspath(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
+
+        ppt_app = win32com.client.Dispatch("PowerPoint.Application")
+        ppt_app.Visible = 1
+        presentation = ppt_app.Presentations.Open(pptx_path, WithWindow=False)
+        try:
+            # Slide size is in points
+            width_px = round(presentation.PageSetup.SlideWidth / 72 * self.dpi)
+            height_px = round(presentation.PageSetup.SlideHeight / 72 * self.dpi)
+            paths = []
+            for slide in presentation.Slides:
+                if slides is not None and slide.SlideIndex not in slides:
+                    continue
+                path = os.path.join(output_dir, SLIDE_NAME_FORMAT.format(slide.SlideIndex))
+                slide.Export(path, "PNG", width_px, height_px)
+                paths.append(path)
+        finally:
+            presentation.Close()
+            ppt_app.Quit()
+        return paths
+
+
+class LibreOfficeRasterizer(SlideRasterizer):
+    """
+    Headless Linux backend.
+
+    A large deck is split into contiguous slide ranges that LibreOffice converts
+    to PDF at the same time, one soffice process per range (SLIDE_CONVERT_WORKERS),
+    each on a user profile kept from earlier conversions. The pages of each range
+    are rasterized by the warm PyMuPDF pool as soon as its PDF exists.
+    """
+
+    name = "libreoffice"
+
+    # One LibreOffice user profile per concurrent conversion; soffice refuses to
+    # share a profile between running instances, and a fresh profile costs seconds.
+    _profiles = queue.Queue()
+    _profile_count = 0
+    _profile_lock = threading.Lock()
+
+    def __init__(self, dpi=None, workers=None, soffice_path=None, converters=None):
+        super().__init__(dpi, workers)
+        self.converters = converters or CONVERT_WORKERS
+        self.soffice_path = (
+            soffice_path
+            or os.environ.get("SOFFICE_PATH")
+            or shutil.which("soffice")
+            or shutil.which("libreoffice")
+            or "soffice"
+        )
+
+    @classmethod
+    def _acquire_profile(cls):
+        try:
+            return cls._profiles.get_nowait()
+        except queue.Empty:
+            with cls._profile_lock:
+                cls._profile_count += 1
+                profile_no = cls._profile_count
+            return os.path.join(tempfile.gettempdir(), f"manual_maker_lo_profile_{os.getpid()}_{profile_no}")
+
+    def convert_to_pdf(self, pptx_path, output_dir):
+        """
+        Convert a presentation to PDF with headless LibreOffice.
+
+        Args:
+            pptx_path (str): Path to the PowerPoint file
+            output_dir (str): Directory to write the PDF to
+
+        Returns:
+            str: Path to the PDF
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        profile = self._acquire_profile()
+        try:
+            subprocess.run(
+                [
+                    self.soffice_path,
+                    f"-env:UserInstallation=file://{profile}",
+                    "--headless", "--norestore",
+                    "--convert-to", "pdf",
+                    "--outdir", output_dir,
+                    os.path.abspath(pptx_path),
+                ],
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+            )
+        finally:
+            self._profiles.put(profile)
+
+        pdf_path = os.path.join(output_dir, os.path.splitext(os.path.basename(pptx_path))[0] + ".pdf")
+        if not os.path.exists(pdf_path):
+            raise RuntimeError(f"LibreOffice did not produce a PDF for: {pptx_path}")
+        return pdf_path
+
+    def _convert_range(self, pptx_path, slides, output_dir):
+        """Convert only the given slides of a deck, in order, to a PDF of their own."""
+        from pptx import Presentation
+
+        prs = Presentation(pptx_path)
+        keep = set(slides)
+        slide_list = prs.slides._sldIdLst
+        for slide_no, slide_id in reversed(list(enumerate(slide_list, start=1))):
+            if slide_no not in keep:
+                # Dropping the relationship leaves the slide and its media out of the saved copy
+                prs.part.drop_rel(slide_id.rId)
+                slide_list.remove(slide_id)
+        os.makedirs(output_dir, exist_ok=True)
+        range_path = os.path.join(output_dir, f"slides_{slides[0]}_{slides[-1]}.pptx")
+        prs.save(range_path)
+        return self.convert_to_pdf(range_path, output_dir)
+
+    def _convert(self, pptx_path, slides, work_dir):
+        """
+        Convert the slides of a deck to PDF, split across concurrent conversions.
+
+        Yields:
+            tuple: (PDF path, slide number of each of its pages) as each range is converted
+        """
+        from pptx import Presentation
+
+        slide_count = len(Presentation(pptx_path).slides)
+        if slides is None:
+            slides = range(1, slide_count + 1)
+        slides = [slide_no for slide_no in sorted(set(slides)) if 1 <= slide_no <= slide_count]
+        if not slides:
+            return
+
+        ranges = min(self.converters, math.ceil(len(slides) / SLIDES_PER_CONVERSION))
+        if ranges <= 1:
+            # The whole deck in one go; its pages are its slides
+            yield self.convert_to_pdf(pptx_path, work_dir), {slide_no: slide_no for slide_no in slides}
+            return
+
+        size = math.ceil(len(slides) / ranges)
+        chunks = [slides[i:i + size] for i in range(0, len(slides), size)]
+        with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+            futures = {
+                pool.submit(self._convert_range, pptx_path, chunk, os.path.join(work_dir, str(i))): chunk
+                for i, chunk in enumerate(chunks)
+            }
+            for future in as_completed(futures):
+                chunk = futures[future]
+                yield future.result(), dict(enumerate(chunk, start=1))
+
+    def render_images(self, pptx_path, slides=None):
+        with tempfile.TemporaryDirectory() as work_dir:
+            futures = {}
+            for pdf_path, pages in self._convert(pptx_path, slides, work_dir):
+                for page_no, slide_no in pages.items():
+                    futures[slide_no] = submit_page_render(pdf_path, page_no, self.dpi, workers=self.workers)
+            return {slide_no: futures[slide_no].result() for slide_no in sorted(futures)}
+
+    def render(self, pptx_path, output_dir, slides=None):
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for slide_no, data in self.render_images(pptx_path, slides).items():
+            path = os.path.join(output_dir, SLIDE_NAME_FORMAT.format(slide_no))
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+        return paths
+
+
+RASTERIZERS = {
+    PowerPointRasterizer.name: PowerPointRasterizer,
+    LibreOfficeRasterizer.name: LibreOfficeRasterizer,
+}
+
+
+def get_rasterizer(name=None, dpi=None, workers=None):
+    """
+    Create a slide rasterizer.
+
+    Args:
+        name (str): Backend name from RASTERIZERS. Defaults to the SLIDE_RASTERIZER
+            environment variable, then PowerPoint on Windows and LibreOffice elsewhere.
+        dpi (int): Render resolution (SLIDE_RENDER_DPI, default 96)
+        workers (int): Parallel render processes (SLIDE_RENDER_WORKERS, default 4)
+
+    Returns:
+        SlideRasterizer: The backend instance
+    """
+    name = name or os.environ.get("SLIDE_RASTERIZER")
+    if not name:
+        name = PowerPointRasterizer.name if sys.platform == "win32" else LibreOfficeRasterizer.name
+    if name not in RASTERIZERS:
+        raise ValueError(f"Unknown slide rasterizer '{name}'. Choose from: {', '.join(RASTERIZERS)}")
+    return RASTERIZERS[name](dpi=dpi, workers=workers)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Measure how slide rendering scales with the number of LibreOffice conversions.")
+    parser.add_argument("pptx", help="Deck to render")
+    parser.add_argument("--converters", type=int, nargs="+", default=[1, 2, 4], help="Conversion counts to compare")
+    args = parser.parse_args()
+
+    baseline = None
+    for converters in args.converters:
+        rasterizer = LibreOfficeRasterizer(converters=converters)
+        start = time.perf_counter()
+        slide_count = len(rasterizer.render_images(args.pptx))
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(
+            f"⏱️ {converters} conversion(s): {slide_count} slides in {elapsed:.1f}s "
+            f"({slide_count / elapsed:.1f} slides/s, {baseline / elapsed:.2f}x)"
+        )
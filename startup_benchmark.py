@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# What each process imports before it can do any work
+TARGETS = {
+    "app": "app",
+    "queue worker": "job_queue",
+    "generation worker": "manual_generator",
+    "render pool worker": "pdf_renderer",
+    "OCR pool worker": "ocr_service",
+}
+
+# Backends that should only be loaded by the jobs that need them
+HEAVY_MODULES = ["streamlit", "docx", "pptx", "fitz", "pytesseract", "PyPDF2", "PIL", "openpyxl", "win32com"]
+
+_MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_s": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module, runs=5):
+    """
+    Measure the cold import time of a module, each run in a fresh interpreter.
+
+    Args:
+        module (str): Module to import
+        runs (int): Interpreters to start
+
+    Returns:
+        dict: "median_s" and "min_s" import time, the "heavy" backends the import
+            loaded, or "error" when the module cannot be imported here
+    """
+    # No worker pool is started when importing the app
+    env = dict(os.environ, MANUAL_QUEUE_WORKERS="0")
+    code = _MEASURE.format(module=module, heavy=HEAVY_MODULES)
+    timings = []
+    heavy = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, env=env,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        lines = result.stdout.strip().splitlines()
+        if result.returncode != 0 or not lines:
+            error = result.stderr.strip().splitlines()
+            return {"error": error[-1] if error else f"exit code {result.returncode}"}
+        measurement = json.loads(lines[-1])
+        timings.append(measurement["import_s"])
+        heavy = measurement["heavy"]
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "heavy": heavy}
+
+
+def run_benchmark(runs=5, targets=None):
+    """
+    Measure every startup target.
+
+    Args:
+        runs (int): Fresh interpreters per target
+        targets (dict): Label -> module (TARGETS)
+
+    Returns:
+        dict: Label -> measurement (see measure_import)
+    """
+    return {label: measure_import(module, runs) for label, module in (targets or TARGETS).items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cold import time of the app and the worker processes.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--json", default=None, help="Append the results as one JSON line to this file, to track them over time")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Exit with an error when a target's median exceeds this")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.runs)
+    over_budget = []
+    for label, result in results.items():
+        if "error" in result:
+            print(f"⚠️ {label}: could not be imported ({result['error']})")
+            continue
+        heavy = ", ".join(result["heavy"]) or "none"
+        print(f"⏱️ {label}: {result['median_s'] * 1000:.0f} ms median, {result['min_s'] * 1000:.0f} ms best (loads: {heavy})")
+        if args.budget_ms is not None and result["median_s"] * 1000 > args.budget_ms:
+            over_budget.append(label)
+
+    if args.json:
+        with open(args.json, "a") as f:
+            f.write(json.dumps({"timestamp": time.time(), "python": sys.version.split()[0], "results": results}) + "\n")
+
+    if over_budget:
+        print(f"❌ Over the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
@@ -0,0 +1,92 @@
+import copy
+import hashlib
+import os
+import threading
+
+from placeholder_index import bind_compiled, compile_document
+
+# Template file hash -> (parsed Document, compiled placeholder index).
+# The Document is only ever deep-copied, never used directly.
+_templates = {}
+# Template path -> hash of the file it held when last loaded
+_template_hashes = {}
+_templates_lock = threading.RLock()
+
+
+def hash_file(path):
+    """
+    Get the SHA-256 hex digest of a file.
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load(template_path):
+    from docx import Document
+
+    path = os.path.abspath(template_path)
+    key = hash_file(path)
+    with _templates_lock:
+        cached = _templates.get(key)
+        if cached is None:
+            document = Document(path)
+            # Compiled on a copy: walking the document caches proxies of inner
+            # elements on it, and deepcopy would detach those from the clone's tree
+            cached = (document, compile_document(copy.deepcopy(document)))
+            _templates[key] = cached
+
+        # Forget the parse of a file this path no longer holds
+        previous = _template_hashes.get(path)
+        _template_hashes[path] = key
+        if previous not in (None, key) and previous not in _template_hashes.values():
+            _templates.pop(previous, None)
+    return cached
+
+
+def preload_template(template_path):
+    """
+    Parse a template once and keep it in memory for open_template.
+
+    Args:
+        template_path (str): Path to the .docx template
+    """
+    _load(template_path)
+
+
+def open_template(template_path):
+    """
+    Get a fresh copy of a template to build one manual in.
+
+    The template is parsed on first use and again only when its content
+    changes (the cache is keyed by the file's hash); every call returns a
+    deep copy of the parsed package, so no file is copied or re-parsed per
+    job and jobs never share XML.
+
+    Args:
+        template_path (str): Path to the .docx template
+
+    Returns:
+        Document: Unmodified copy of the template with its placeholder index bound
+    """
+    document, compiled = _load(template_path)
+    # lxml trees are not safe to walk from several threads at once
+    with _templates_lock:
+        clone = copy.deepcopy(document)
+    bind_compiled(clone, compiled)
+    return clone
+
+
+def clear_template_cache():
+    """Drop every parsed template."""
+    with _templates_lock:
+        _templates.clear()
+        _template_hashes.clear()
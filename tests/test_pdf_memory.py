@@ -0,0 +1,58 @@
+import pytest
+
+import pdf_doc_extractor
+import render_cache
+from job_queue import current_rss_mb
+
+PAGE_COUNT = 500
+RENDER_DPI = 150
+
+# Growth of this process's resident memory allowed while every page is
+# rendered; holding all the pages at once would need several times this
+MAX_RSS_GROWTH_MB = 25
+
+
+def _make_pdf(path, page_count):
+    import fitz
+
+    pdf = fitz.open()
+    for page_no in range(1, page_count + 1):
+        page = pdf.new_page(width=842, height=595)  # A4 landscape, like an E-PLAN sheet
+        for row in range(40):
+            page.insert_text((30, 30 + row * 13), f"Sheet {page_no} / terminal X{row}:{page_no} -K{row}.{page_no % 7} 24V DC",
+                             fontsize=9)
+        for column in range(12):
+            x = 420 + column * 32
+            page.draw_line((x, 30), (x, 560), width=0.5)
+            page.draw_circle((x, 30 + (page_no * 7 + column * 41) % 520), 6)
+    pdf.save(path)
+    pdf.close()
+
+
+@pytest.mark.skipif(current_rss_mb() is None, reason="resident memory cannot be read here")
+def test_streaming_500_pages_keeps_peak_rss_flat(tmp_path, monkeypatch):
+    pdf_path = str(tmp_path / "drawings.pdf")
+    _make_pdf(pdf_path, PAGE_COUNT)
+    # Every page is rendered rather than read back from an earlier run
+    monkeypatch.setattr(render_cache, "CACHE_ENABLED", False)
+
+    pages = pdf_doc_extractor.iter_pdf_pages(pdf_path, dpi=RENDER_DPI, max_in_flight=4)
+    # The first page starts the render pool; memory is measured from there
+    first_page_no, image, _ = next(pages)
+    baseline_mb = peak_mb = current_rss_mb()
+    total_bytes = len(image)
+    page_count = 1
+    for page_no, image, embedded in pages:
+        assert page_no == first_page_no + page_count and not embedded
+        total_bytes += len(image)
+        page_count += 1
+        del image
+        peak_mb = max(peak_mb, current_rss_mb())
+
+    assert page_count == PAGE_COUNT
+    # The test only means something if keeping every page would break the limit
+    assert total_bytes / (1024 * 1024) > 3 * MAX_RSS_GROWTH_MB
+    assert peak_mb - baseline_mb < MAX_RSS_GROWTH_MB, (
+        f"peak RSS grew {peak_mb - baseline_mb:.0f} MB over {PAGE_COUNT} pages "
+        f"({total_bytes / (1024 * 1024):.0f} MB of images)"
+    )
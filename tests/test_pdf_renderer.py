@@ -0,0 +1,9 @@
+import pytest
+
+from pdf_renderer import submit_page_render
+
+
+def test_submit_page_render_needs_a_file():
+    # Pool workers would get the whole PDF pickled with every page
+    with pytest.raises(TypeError):
+        submit_page_render(b"%PDF-1.7", 1, 72)
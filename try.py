@@ -1,14 +1,8 @@
-from pptx_data_processing import (
-    process_dap_to_docx,
-    process_sop_to_docx,
-    process_hmi_to_docx,
-    process_scada_to_docx,
-)
 from docx import Document
+from job import Job
+from sections import get_section
 
 from Img_expraction import (
-    process_machine_photos,
-    process_layout_photos,
     remove_unused_placeholders,
     get_images_from_folder
 )
@@ -16,8 +10,6 @@ from Img_expraction import (
 from pdf_doc_extractor import (
     pdf_to_images,
     insert_pdf_images_at_placeholder,
-    process_eplan_pdf_to_docx,
-    process_alarms_pdf_to_docx
 )
 from project_details import (
     extract_project_info,
@@ -32,25 +24,13 @@ output_path = "output/manualv2.docx"
 pdf_path = "uploads/E-PLAN_Drawing/PM009_EPLAN.pdf"
 output_dir = "output/pdf_images"
 
-# process_machine_photos(doc, docx_path) 
-# process_machine_photos(doc, docx_path) 
-# process_layout_photos(doc, docx_path)
-doc, dap_processed = process_dap_to_docx(
-    folder_path="uploads/DAP",
-    template_path="template/base_file.docx",
-)
-# process_sop_to_docx(
-#     folder_path="uploads/SOP",
-#     template_path="template/base_file.docx",
-# )
-# process_hmi_to_docx(
-#     folder_path="uploads/HMI",
-#     template_path="template/base_file.docx",
-# )
-# process_scada_to_docx(
-#     folder_path="uploads/SCADA",
-#     template_path="template/base_file.docx",
-# )
+job = Job(uploads_dir="uploads")
+# get_section("Machine_Photos").insert(job, docx_path)
+# get_section("Layout_Photos").insert(job, docx_path)
+get_section("DAP").insert(job, "template/base_file.docx")
+# get_section("SOP").insert(job, "template/base_file.docx")
+# get_section("HMI").insert(job, "template/base_file.docx")
+# get_section("SCADA").insert(job, "template/base_file.docx")
 
 # remove_unused_placeholders(doc, output_path)
 
@@ -62,15 +42,9 @@ doc, dap_processed = process_dap_to_docx(
 # placeholder= "{{Upload_Electrical_drawing_here}}"
 # insert_pdf_images_at_placeholder(docx_path, output_dir, placeholder)
 
-# process_eplan_pdf_to_docx(
-#     folder_path = "uploads/E-PLAN_Drawing",
-#     template_path = "template/base_file.docx"
-# )
+# get_section("E-PLAN_Drawing").insert(job, "template/base_file.docx")
 
-# process_alarms_pdf_to_docx(
-#     folder_path = "uploads/Alarms",
-#     template_path = "template/base_file.docx"
-# )
+# get_section("Alarms").insert(job, "template/base_file.docx")
 
 
 
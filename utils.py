@@ -1,4 +1,7 @@
+import contextlib
+import io
 import os
+import tempfile
 
 
 def save_uploaded_file(uploaded_file, directory, filename):
@@ -48,3 +51,85 @@ def validate_inputs(text_inputs, file_inputs):
             missing_fields.append(field_name)
 
     return len(missing_fields) == 0, missing_fields
+
+
+def open_docx(docx):
+    """
+    Open a Word document, or pass an already-open Document straight through.
+
+    Pipeline stages accept either a path (the original open/save-per-stage
+    behaviour) or a shared Document object that is serialized once by the caller.
+
+    Args:
+        docx (str | Document): Path to the .docx file or an open Document
+
+    Returns:
+        Document: The document to work on
+    """
+    if isinstance(docx, (str, os.PathLike)):
+        # Imported here so the app can use the form helpers without loading python-docx
+        from docx import Document
+
+        return Document(docx)
+    return docx
+
+
+def save_docx(doc, docx):
+    """
+    Save a document only if the stage was given a path.
+
+    Args:
+        doc (Document): Document object that was modified
+        docx (str | Document): What the stage was called with
+
+    Returns:
+        bool: Whether the document was written to disk
+    """
+    if isinstance(docx, (str, os.PathLike)):
+        doc.save(docx)
+        return True
+    return False
+
+
+def open_source(source):
+    """
+    Get something file-based libraries can read an input from.
+
+    Job inputs are either a path on disk or the uploaded bytes kept in memory
+    (see Job.add_input).
+
+    Args:
+        source (str | bytes): Path or file contents
+
+    Returns:
+        str | BytesIO: The path, or a stream over the bytes
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+
+@contextlib.contextmanager
+def source_path(source, suffix=""):
+    """
+    Get a path to an input for tools that can only read files (LibreOffice,
+    PowerPoint, worker processes).
+
+    In-memory inputs are written to a temporary file that is removed again
+    when the block exits.
+
+    Args:
+        source (str | bytes): Path or file contents
+        suffix (str): File extension the tool expects, e.g. ".pptx"
+
+    Yields:
+        str: Path to the input
+    """
+    if not isinstance(source, (bytes, bytearray, memoryview)):
+        yield source
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"input{suffix}")
+        with open(path, "wb") as f:
+            f.write(source)
+        yield path